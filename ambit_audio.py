@@ -0,0 +1,431 @@
+"""
+Ambit AI Audio Primitives
+Low-level audio containers shared by the backend's streaming pipeline.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+
+# ==============================================================================
+# 1. PER-CLIENT RING BUFFER
+# ==============================================================================
+
+class AudioRingBuffer:
+    """
+    A preallocated float32 buffer holding the most recent `max_seconds` of a
+    client's microphone stream.
+
+    Samples are appended into a backing array twice the capacity in size, so the
+    buffered window is always contiguous and can be handed out as a NumPy view
+    without copying. When the write head reaches the end, the live window is
+    moved back to the front once (amortized O(1) per sample).
+
+    Views returned by `view()` and `pcm16()` are only valid until the next call
+    that mutates the buffer. `total_written` counts every sample ever appended,
+    so absolute stream positions (e.g. from `StreamingVAD`) can be mapped back
+    onto the buffer with `to_buffer_index()`.
+    """
+    def __init__(self, sample_rate: int = 16000, max_seconds: float = 15.0):
+        self.sample_rate = sample_rate
+        self.capacity = int(sample_rate * max_seconds)
+        self._data = np.zeros(self.capacity * 2, dtype=np.float32)
+        self._pcm16 = np.zeros(self.capacity, dtype=np.int16)
+        self._start = 0
+        self._end = 0
+        self.total_written = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def extend(self, samples: np.ndarray) -> None:
+        """Appends samples, dropping the oldest ones beyond the capacity."""
+        samples = np.asarray(samples, dtype=np.float32)
+        count = len(samples)
+        if count == 0:
+            return
+        self.total_written += count
+
+        if count >= self.capacity:
+            self._data[:self.capacity] = samples[-self.capacity:]
+            self._start, self._end = 0, self.capacity
+            return
+
+        if self._end + count > len(self._data):
+            # Compact: move the part of the window that survives this write to the front.
+            keep = min(len(self), self.capacity - count)
+            self._data[:keep] = self._data[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+
+        self._data[self._end:self._end + count] = samples
+        self._end += count
+        if self._end - self._start > self.capacity:
+            self._start = self._end - self.capacity
+
+    def view(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Returns a zero-copy float32 view of buffered samples [start, end)."""
+        length = len(self)
+        end = length if end is None else min(end, length)
+        start = max(0, min(start, end))
+        return self._data[self._start + start:self._start + end]
+
+    def pcm16(self, start: int = 0, end: int = None) -> np.ndarray:
+        """
+        Converts buffered samples [start, end) to 16-bit PCM in a preallocated
+        scratch array and returns a view of it (no intermediate float copies).
+        """
+        segment = self.view(start, end)
+        out = self._pcm16[:len(segment)]
+        np.multiply(segment, 32767, out=out, casting="unsafe")
+        return out
+
+    def to_buffer_index(self, stream_position: int) -> int:
+        """Maps an absolute stream sample position to an index into the buffered window."""
+        return max(0, stream_position - (self.total_written - len(self)))
+
+    def clear(self) -> None:
+        """Drops all buffered samples without releasing the backing storage."""
+        self._start = 0
+        self._end = 0
+
+
+# ==============================================================================
+# 2. STREAMING VOICE ACTIVITY DETECTION
+# ==============================================================================
+
+class _SpeechTracker:
+    """
+    Frame-by-frame port of the segmentation rules in Silero's
+    `get_speech_timestamps`: a segment opens when the probability reaches
+    `threshold` and closes after `min_silence_ms` below `threshold - 0.15`.
+    Segments shorter than `min_speech_ms` are discarded.
+    """
+    def __init__(self, sample_rate: int, threshold: float, min_speech_ms: int, min_silence_ms: int):
+        self.threshold = threshold
+        self.neg_threshold = max(threshold - 0.15, 0.01)
+        self.min_speech_samples = sample_rate * min_speech_ms // 1000
+        self.min_silence_samples = sample_rate * min_silence_ms // 1000
+        self.reset()
+
+    def reset(self):
+        self.triggered = False
+        self.current_start = 0
+        self.temp_end = 0
+
+    def update(self, prob: float, position: int) -> Optional[Dict[str, int]]:
+        """Advances by one frame starting at `position`. Returns a segment when one closes."""
+        if prob >= self.threshold and self.temp_end:
+            self.temp_end = 0
+        if prob >= self.threshold and not self.triggered:
+            self.triggered = True
+            self.current_start = position
+            return None
+        if prob < self.neg_threshold and self.triggered:
+            if not self.temp_end:
+                self.temp_end = position
+            if position - self.temp_end < self.min_silence_samples:
+                return None
+            segment = {'start': self.current_start, 'end': self.temp_end}
+            self.reset()
+            if segment['end'] - segment['start'] > self.min_speech_samples:
+                return segment
+        return None
+
+    def open_samples(self, position: int) -> int:
+        """Length of the segment still in progress at `position`, if it already counts as speech."""
+        if not self.triggered:
+            return 0
+        length = position - self.current_start
+        return length if length > self.min_speech_samples else 0
+
+
+class StreamingVAD:
+    """
+    Stateful, per-client voice activity detector (VADIterator-style).
+
+    Only newly received samples are cut into frames for the Silero model; the
+    client's recurrent model state lives in `model_state` and is carried across
+    calls by the `VADScheduler` that runs inference. Two trackers share each
+    frame's speech probability:
+      - end-of-turn (0.4 threshold, 250 ms min speech, 700 ms min silence), which
+        emits `speech_start` and, after 0.8 s of trailing silence, `speech_end`
+        with the utterance bounds. As soon as that trailing silence begins it
+        emits `silence_start` with the bounds the utterance will have if the
+        silence holds, and `speech_resumed` if the user starts talking again
+        before `speech_end`, so callers can speculate on the utterance early;
+      - barge-in (0.5 threshold, 80 ms min speech), which emits `interruption`
+        once 2 s of speech have accumulated while `detect_interruption` is set.
+
+    Audio at an integer multiple of 16 kHz (e.g. 32 or 48 kHz) is decimated to
+    16 kHz before framing, as Silero's own helpers do. All sample positions in
+    events are absolute stream positions at the input sample rate.
+    """
+    SPEECH_PAD_MS = 30
+    END_OF_TURN_SILENCE_S = 0.8
+    INTERRUPTION_SPEECH_S = 2.0
+
+    def __init__(self, sample_rate: int = 16000):
+        if sample_rate in (8000, 16000):
+            self.step = 1
+        elif sample_rate % 16000 == 0:
+            self.step = sample_rate // 16000
+        else:
+            raise ValueError(f"Streaming VAD supports 8000 Hz or multiples of 16000 Hz audio, got {sample_rate}")
+        self.sample_rate = sample_rate  # Input rate; event positions use it
+        self.model_rate = sample_rate // self.step  # Rate the frames are cut (and the model run) at
+        # Everything below counts samples at `model_rate`
+        self.frame_size = 512 if self.model_rate == 16000 else 256
+        self.speech_pad = self.model_rate * self.SPEECH_PAD_MS // 1000
+        self.end_of_turn_silence = int(self.model_rate * self.END_OF_TURN_SILENCE_S)
+        self.interruption_samples = int(self.model_rate * self.INTERRUPTION_SPEECH_S)
+
+        self._turn = _SpeechTracker(self.model_rate, threshold=0.4, min_speech_ms=250, min_silence_ms=700)
+        self._barge_in = _SpeechTracker(self.model_rate, threshold=0.5, min_speech_ms=80, min_silence_ms=100)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._phase = 0  # Input samples to skip before the next kept one when decimating
+        self.position = 0
+        self.model_state = None  # Opaque Silero (state, context) pair, owned by the scheduler
+        self._reset_turn()
+
+    def _reset_turn(self):
+        self._segments: List[Dict[str, int]] = []
+        self._barge_in_samples = 0
+        self._silence_pending = False  # A `silence_start` is waiting for `speech_end` or `speech_resumed`
+
+    def reset(self):
+        """Clears all speech state, including the model's recurrent state."""
+        self.model_state = None
+        self._turn.reset()
+        self._barge_in.reset()
+        self.position += len(self._pending)  # Skipped samples still advance the stream
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._reset_turn()
+
+    def take_frames(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Appends newly received samples and returns every complete frame as a
+        (frames, frame_size) array. Leftover samples wait for the next call.
+        """
+        if self.step > 1:
+            kept = samples[self._phase::self.step]
+            self._phase = (self._phase - len(samples)) % self.step
+            samples = kept
+        audio = np.concatenate((self._pending, samples)) if len(self._pending) else samples
+        frame_count = len(audio) // self.frame_size
+        used = frame_count * self.frame_size
+        self._pending = np.array(audio[used:], dtype=np.float32)
+        return np.ascontiguousarray(audio[:used], dtype=np.float32).reshape(frame_count, self.frame_size)
+
+    def apply(self, probs: np.ndarray, detect_interruption: bool = False) -> List[Dict[str, Any]]:
+        """Applies the speech probabilities for frames from `take_frames` and returns the events they produced."""
+        events = []
+        for prob in probs:
+            events.extend(self._advance(float(prob), detect_interruption))
+        if self.step > 1:
+            for event in events:
+                for key in ('start', 'end'):
+                    if key in event:
+                        event[key] *= self.step
+        return events
+
+    def _advance(self, prob: float, detect_interruption: bool) -> List[Dict[str, Any]]:
+        """Applies one frame's speech probability to both trackers."""
+        events = []
+        position = self.position
+        self.position += self.frame_size
+
+        was_triggered = self._turn.triggered
+        had_silence = bool(self._turn.temp_end)
+        segment = self._turn.update(prob, position)
+        if segment:
+            self._segments.append(segment)
+        resumed_in_silence = self._turn.triggered and had_silence and not self._turn.temp_end
+        if self._turn.triggered and not was_triggered:
+            events.append({'type': 'speech_start', 'start': max(0, position - self.speech_pad)})
+            resumed_in_silence = resumed_in_silence or bool(self._segments)
+
+        if self._silence_pending and resumed_in_silence:
+            events.append({'type': 'speech_resumed'})
+            self._silence_pending = False
+        elif (self._turn.triggered and self._turn.temp_end and not had_silence
+                and self._turn.temp_end - self._turn.current_start > self._turn.min_speech_samples):
+            # Trailing silence just began after a segment long enough to be kept.
+            first_start = self._segments[0]['start'] if self._segments else self._turn.current_start
+            events.append({
+                'type': 'silence_start',
+                'start': max(0, first_start - self.speech_pad),
+                'end': self._turn.temp_end + self.speech_pad,
+            })
+            self._silence_pending = True
+
+        barge_in_segment = self._barge_in.update(prob, position)
+        if barge_in_segment:
+            self._barge_in_samples += barge_in_segment['end'] - barge_in_segment['start']
+
+        if detect_interruption:
+            speech_samples = self._barge_in_samples + self._barge_in.open_samples(self.position)
+            if speech_samples >= self.interruption_samples:
+                events.append({'type': 'interruption', 'speech_seconds': speech_samples / self.model_rate})
+                self._barge_in_samples = 0
+                self._barge_in.reset()
+
+        if self._segments and not self._turn.triggered:
+            speech_end = self._segments[-1]['end']
+            if self.position - speech_end > self.end_of_turn_silence:
+                events.append({
+                    'type': 'speech_end',
+                    'start': max(0, self._segments[0]['start'] - self.speech_pad),
+                    'end': speech_end + self.speech_pad,
+                })
+                self._reset_turn()
+        return events
+
+
+# ==============================================================================
+# 3. BATCHED CROSS-CLIENT VAD INFERENCE
+# ==============================================================================
+
+_STOP = object()
+
+
+class VADScheduler:
+    """
+    Runs Silero VAD for every connected client on one dedicated thread.
+
+    Clients submit the frames cut by their `StreamingVAD` and await the speech
+    probabilities. The worker collects requests for up to `max_wait_ms` (or until
+    `max_batch_size` clients are waiting) and advances all of them together, one
+    batched forward pass per frame step. Each client's recurrent state is swapped
+    into the model's `_state`/`_context` before the pass and read back afterwards,
+    which relies on the state attributes Silero v5 exposes on both its JIT and
+    ONNX models.
+    """
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._batch_latencies_ms = deque(maxlen=500)
+        self._stats = {'batches': 0, 'frames': 0, 'max_batch_size_seen': 0}
+
+    def start(self):
+        """Starts the inference thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vad-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the inference thread once queued work has drained."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    async def infer(self, stream: StreamingVAD, frames: np.ndarray) -> np.ndarray:
+        """Queues a client's frames for the next batch and returns one speech probability per frame."""
+        if not len(frames):
+            return np.zeros(0, dtype=np.float32)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((stream, frames, loop, future))
+        return await future
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns batch counters and recent per-batch latency figures."""
+        latencies = sorted(self._batch_latencies_ms)
+        stats = dict(self._stats, max_batch_size=self.max_batch_size, max_wait_ms=self.max_wait * 1000)
+        if latencies:
+            stats['last_batch_ms'] = round(self._batch_latencies_ms[-1], 2)
+            stats['avg_batch_ms'] = round(sum(latencies) / len(latencies), 2)
+            stats['p95_batch_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+        return stats
+
+    def _run(self):
+        next_request = None
+        while True:
+            request = next_request if next_request is not None else self._queue.get()
+            next_request = None
+            if request is _STOP:
+                break
+            batch = [request]
+            streams = {id(request[0])}
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP or id(item[0]) in streams:
+                    # A stream's frames must be processed in order, so it starts the next batch.
+                    next_request = item
+                    break
+                batch.append(item)
+                streams.add(id(item[0]))
+            self._process_batch(batch)
+
+    def _process_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            results = [np.empty(len(frames), dtype=np.float32) for _, frames, _, _ in batch]
+            by_rate: Dict[int, List[int]] = {}
+            for index, (stream, _, _, _) in enumerate(batch):
+                by_rate.setdefault(stream.model_rate, []).append(index)
+
+            for sample_rate, indices in by_rate.items():
+                steps = max(len(batch[i][1]) for i in indices)
+                for step in range(steps):
+                    active = [i for i in indices if step < len(batch[i][1])]
+                    x = torch.from_numpy(np.stack([batch[i][1][step] for i in active]))
+                    probs = self._forward(x, [batch[i][0] for i in active], sample_rate)
+                    for i, prob in zip(active, probs):
+                        results[i][step] = prob
+        except Exception as e:
+            for _, _, loop, future in batch:
+                loop.call_soon_threadsafe(_resolve_future, future, None, e)
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._batch_latencies_ms.append(elapsed_ms)
+        self._stats['batches'] += 1
+        self._stats['frames'] += sum(len(frames) for _, frames, _, _ in batch)
+        self._stats['max_batch_size_seen'] = max(self._stats['max_batch_size_seen'], len(batch))
+        for (_, _, loop, future), probs in zip(batch, results):
+            loop.call_soon_threadsafe(_resolve_future, future, probs, None)
+
+    def _forward(self, x: torch.Tensor, streams: List[StreamingVAD], sample_rate: int) -> np.ndarray:
+        """Runs one batched frame step, swapping each stream's recurrent state in and out."""
+        context_size = 64 if sample_rate == 16000 else 32
+        states, contexts = [], []
+        for stream in streams:
+            if stream.model_state is None:
+                stream.model_state = (torch.zeros(2, 1, 128), torch.zeros(1, context_size))
+            states.append(stream.model_state[0])
+            contexts.append(stream.model_state[1])
+
+        self.model._state = torch.cat(states, dim=1)
+        self.model._context = torch.cat(contexts, dim=0)
+        self.model._last_sr = sample_rate
+        self.model._last_batch_size = len(streams)
+        with torch.no_grad():
+            out = self.model(x, sample_rate)
+
+        for i, stream in enumerate(streams):
+            stream.model_state = (self.model._state[:, i:i + 1].clone(), self.model._context[i:i + 1].clone())
+        return out.reshape(-1).numpy()
+
+
+def _resolve_future(future: asyncio.Future, result, error):
+    """Completes a scheduler future on its own event loop, unless the caller gave up on it."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
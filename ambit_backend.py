@@ -9,71 +9,258 @@ This file combines the logic from the previous ambit_ai.py and ambit_web_backend
 import asyncio
 import json
 import os
-import tempfile
+import time
 import base64
-from typing import List, Dict, Any, Optional
-from concurrent.futures import ProcessPoolExecutor, Executor
+import itertools
+import re
+from typing import List, Dict, Any, Optional, AsyncIterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Executor
 import traceback
+from collections import Counter
 
 # --- AI and Machine Learning Libraries ---
 import numpy as np
-import torch
-import openai
 from websockets.asyncio.server import serve as websockets_serve
 from websockets.exceptions import ConnectionClosed
 from elevenlabs import VoiceSettings
-from elevenlabs.client import ElevenLabs
-from silero_vad import load_silero_vad, get_speech_timestamps
+from silero_vad import load_silero_vad
 from dotenv import load_dotenv
 
 # --- Application-Specific Imports ---
 from ambit_instructions import get_system_prompt
+from ambit_sessions import Session, SessionBusyError, SessionManager
+from ambit_media import MediaAsset, MP3DurationTracker, media_cache, mp3_duration
+from ambit_shared_memory import cleanup_stale_segments, share_resource_tracker
+from ambit_tts_cache import TTSCache, tts_cache_key
+from ambit_clients import get_async_openai_client, get_async_elevenlabs_client, provider_slot
+from ambit_context import ContextBuilder, ConversationMemory, format_for_summary
+from ambit_transcription import TranscriptionBackend, create_transcription_backend
+from ambit_audio import AudioRingBuffer, StreamingVAD, VADScheduler
+from ambit_protocol import (
+    MSG_AUDIO_IN, MSG_TTS_AUDIO, ENCODING_MP3, ENCODING_NAMES, pack_frame, unpack_frame, decode_pcm
+)
 from tools.registry import tools_registry
+from tools.vision_pool import VisionWorkerPool
+from tools.camera_utils import camera_service
 
 # --- Initial Setup ---
 load_dotenv()
 
+TTS_OUTPUT_FORMAT = "mp3_22050_32"
+SONG_INTRO_FALLBACK = "Here it is."
+# Fixed phrases synthesized into the TTS cache at startup, plus any listed in TTS_PREWARM_FILE (one per line)
+TTS_PREWARM_PHRASES = [SONG_INTRO_FALLBACK]
+
 # ==============================================================================
 # 1. AMBIT AI CORE LOGIC CLASS
 # ==============================================================================
 
+class SentenceSplitter:
+    """
+    Accumulates streamed text deltas and yields complete sentences, so speech
+    synthesis can start before the model has finished its response. Very short
+    sentences are merged with the next one to avoid tiny TTS requests.
+    """
+    SENTENCE_END = re.compile(r'[.!?…]+["\')\]]*\s+')
+    MIN_SENTENCE_CHARS = 12
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """Adds a text delta and returns any sentences it completed."""
+        self._buffer += delta
+        sentences = []
+        start = 0
+        for match in self.SENTENCE_END.finditer(self._buffer):
+            if match.end() - start < self.MIN_SENTENCE_CHARS:
+                continue
+            sentences.append(self._buffer[start:match.end()].strip())
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Returns whatever text is left once the stream has ended."""
+        tail, self._buffer = self._buffer.strip(), ""
+        return tail or None
+
+
 class AmbitAI:
     """
     The 'brain' of Ambit. Manages conversation history, interfaces with OpenAI 
     and ElevenLabs, and orchestrates tool calls.
     """
-    def __init__(self, process_executor: Optional[Executor] = None):
+    def __init__(self, process_executor: Optional[Executor] = None,
+                 transcription_backend: Optional[TranscriptionBackend] = None):
         # Initialize API clients
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+        # Native async clients: no thread per request, and cancelling a turn aborts its HTTP calls
+        self.openai_client = get_async_openai_client()
+        self.elevenlabs_client = get_async_elevenlabs_client()
+        self.transcription_backend = transcription_backend or create_transcription_backend(self.openai_client)
         
         # Load configuration from environment variables
         self.openai_model = os.getenv("OPENAI_MODEL", "gpt-4.1")
         self.elevenlabs_model = os.getenv("ELEVENLABS_MODEL", "eleven_flash_v2_5")
         self.voice_id = os.getenv("ELEVENLABS_VOICE_ID", "1F0HEz1i7DetoXlB32Yy")
+        self.summary_model = os.getenv("OPENAI_SUMMARY_MODEL", "gpt-4.1-mini")
+        self.voice_settings = VoiceSettings(stability=0.5, similarity_boost=0.8, style=0.1, use_speaker_boost=True, speed=1.1)
+
+        # Synthesized speech keyed by text, voice, model and settings; fixed and repeated phrases skip ElevenLabs
+        self.tts_cache = TTSCache(
+            os.getenv("TTS_CACHE_DIR", "tts_cache"),
+            memory_max_bytes=int(float(os.getenv("TTS_CACHE_MEMORY_MB", "16")) * 1024 * 1024),
+            disk_max_bytes=int(float(os.getenv("TTS_CACHE_DISK_MB", "256")) * 1024 * 1024),
+            max_text_chars=int(os.getenv("TTS_CACHE_MAX_CHARS", "80")),
+            admit_after=int(os.getenv("TTS_CACHE_ADMIT_AFTER", "2")),
+            fixed_texts=TTS_PREWARM_PHRASES,
+        )
         
         # Store the executor for CPU-bound tasks (passed from AmbitServer)
         self.process_executor = process_executor
 
-        # Initialize conversation state
-        self.conversation_history: List[Dict[str, str]] = []
+        # Work aborted by cancelled turns (e.g. barge-in), by kind
+        self.cancelled_work = Counter()
+
+        # Prompt window over a conversation's history, bounded by a token budget
+        self.context_builder = ContextBuilder(
+            self.openai_model,
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")),
+            max_tool_output_tokens=int(os.getenv("CONTEXT_MAX_TOOL_OUTPUT_TOKENS", "1000")),
+        )
+
+        # Default conversation state, used when a caller doesn't pass its own session memory
+        self.memory = ConversationMemory(int(os.getenv("CONTEXT_MAX_STORED_MESSAGES", "200")))
         self.system_prompt = get_system_prompt()
         
         print("🤖 Ambit AI 'brain' initialized successfully!")
         print(f"   - OpenAI Model: {self.openai_model}")
         print(f"   - ElevenLabs Model: {self.elevenlabs_model}")
         print(f"   - Voice ID: {self.voice_id}")
+        print(f"   - Transcription: {self.transcription_backend.name}")
+        print(f"   - Context Budget: {self.context_builder.token_budget} tokens")
+
+    def _add_to_history(self, memory: ConversationMemory, message: Dict[str, Any]):
+        """A helper to add a message to a conversation's history."""
+        memory.append(message)
+
+    async def _summarize_history(self, previous_summary: Optional[str], messages: List[Dict[str, Any]]) -> str:
+        """Condenses older conversation messages (and any earlier summary) into a short summary."""
+        transcript = "\n".join(format_for_summary(message) for message in messages)
+        if previous_summary:
+            transcript = f"Earlier summary:\n{previous_summary}\n\nNewer messages:\n{transcript}"
+        started = time.perf_counter()
+        async with provider_slot("openai"):
+            response = await self.openai_client.responses.create(
+                model=self.summary_model,
+                input=[
+                    {"role": "system", "content": (
+                        "Summarize this conversation between a user and the assistant Ambit in a few sentences. "
+                        "Keep names, facts about the user, decisions and open requests; drop small talk."
+                    )},
+                    {"role": "user", "content": transcript},
+                ],
+            )
+        print(f"📚 Summarized {len(messages)} older message(s) in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return response.output_text.strip()
+
+    async def _create_response(self, messages: List[Dict[str, Any]], tools: List[Dict], sentence_queue: Optional[asyncio.Queue] = None):
+        """
+        Calls the Responses API. With a sentence queue, the response is streamed and
+        each complete sentence is put on the queue while later tokens are still arriving.
+        """
+        try:
+            async with provider_slot("openai"):
+                if sentence_queue is None:
+                    return await self.openai_client.responses.create(
+                        model=self.openai_model, input=messages, tools=tools
+                    )
+
+                stream = await self.openai_client.responses.create(
+                    model=self.openai_model, input=messages, tools=tools, stream=True
+                )
+                splitter = SentenceSplitter()
+                response = None
+                try:
+                    async for event in stream:
+                        if event.type == "response.output_text.delta":
+                            for sentence in splitter.feed(event.delta):
+                                await sentence_queue.put(sentence)
+                        elif event.type == "response.completed":
+                            response = event.response
+                        elif event.type in ("response.failed", "error"):
+                            raise RuntimeError(f"OpenAI response stream failed: {event}")
+                finally:
+                    await stream.close()  # Aborts the HTTP stream if we stop early (error or cancellation)
+
+            tail = splitter.flush()
+            if tail:
+                await sentence_queue.put(tail)
+            if response is None:
+                raise RuntimeError("OpenAI response stream ended without a completed response")
+            return response
+        except asyncio.CancelledError:
+            self.cancelled_work['llm_requests'] += 1
+            raise
+
+    async def _execute_tool_call(self, tool_call, voice_id: Optional[str] = None, session_id: Optional[str] = None) -> Any:
+        """Runs one tool call. A failing tool yields an error output rather than failing the turn."""
+        function_name = tool_call.name
+        try:
+            function_args = json.loads(tool_call.arguments)
+
+            if function_name == 'play_favorite_song':
+                function_args['voice_id'] = voice_id or self.voice_id
 
-    def _add_to_history(self, message: Dict[str, Any]):
-        """A helper to add a message to the conversation history."""
-        self.conversation_history.append(message)
+            print(f"  - Executing: {function_name}({json.dumps(function_args)})")
+            function_response = await tools_registry.acall_tool(
+                function_name, function_args, executor=self.process_executor, session_id=session_id
+            )
+        except asyncio.CancelledError:
+            # An executor job that already started can't be stopped; its result is discarded
+            self.cancelled_work['tool_calls'] += 1
+            raise
+        except Exception as e:
+            print(f"  - ❌ Tool {function_name} failed: {e}")
+            return f"Error: Tool '{function_name}' failed: {e}"
+        print(f"  - Result: {function_response}")
+        return function_response
 
-    async def get_response(self, user_input: str, custom_instructions: str = None, voice_id: str = None) -> Dict[str, Any]:
+    async def get_response(self, user_input: str, custom_instructions: str = None, voice_id: str = None,
+                           sentence_queue: Optional[asyncio.Queue] = None,
+                           memory: Optional[ConversationMemory] = None,
+                           session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Gets a complete response from OpenAI, handling the full tool-calling loop.
         Returns a dictionary describing the action to take.
+
+        If `sentence_queue` is given, model text is streamed onto it sentence by
+        sentence as it is generated, and the result is marked `streamed` so the
+        caller doesn't synthesize it a second time.
+
+        `memory` is the session's conversation memory; it defaults to this
+        instance's own. The prompt holds as many recent messages as fit in the
+        context token budget, preceded by a rolling summary of older ones.
+        `session_id` scopes cached tool results to the session.
+
+        A turn that is cancelled (e.g. by barge-in) or fails is removed from the
+        history again, so it never holds a question without its reply.
         """
-        self._add_to_history({"role": "user", "content": user_input})
+        memory = memory if memory is not None else self.memory
+        turn_start = memory.mark()
+        try:
+            return await self._respond(user_input, custom_instructions, voice_id, sentence_queue, memory, session_id)
+        except BaseException:
+            discarded = memory.discard_since(turn_start)
+            if discarded:
+                print(f"↩️ Removed {discarded} message(s) of an unfinished turn from history")
+            raise
+
+    async def _respond(self, user_input: str, custom_instructions: Optional[str], voice_id: Optional[str],
+                       sentence_queue: Optional[asyncio.Queue], memory: ConversationMemory,
+                       session_id: Optional[str]) -> Dict[str, Any]:
+        streamed = sentence_queue is not None
+        self._add_to_history(memory, {"role": "user", "content": user_input})
 
         # Combine system prompt with custom instructions if provided
         system_content = self.system_prompt
@@ -81,21 +268,19 @@ class AmbitAI:
             system_content = f"{self.system_prompt}\n\nAdditional Instructions:\n{custom_instructions}"
             print(f"📝 Using custom instructions: {custom_instructions[:50]}...")
 
-        messages = [{"role": "system", "content": system_content}] + self.conversation_history[-10:]
+        messages, window_start = self.context_builder.build(system_content, memory)
+        memory.schedule_summary(window_start, self._summarize_history)
         tools = tools_registry.get_schemas()
 
         # First call to the model to get either a text response or a tool call decision
-        response = await asyncio.to_thread(
-            self.openai_client.responses.create,
-            model=self.openai_model, input=messages, tools=tools
-        )
+        response = await self._create_response(messages, tools, sentence_queue)
 
         tool_calls = [item for item in response.output if item.type == "function_call"]
         assistant_response_text = response.output_text
         
         # Add the assistant's potential text response to history
         if assistant_response_text:
-            self._add_to_history({"role": "assistant", "content": assistant_response_text})
+            self._add_to_history(memory, {"role": "assistant", "content": assistant_response_text})
 
         # Handle the special case of playing the favorite song
         is_playing_song = any(tc.name == 'play_favorite_song' for tc in tool_calls)
@@ -103,15 +288,17 @@ class AmbitAI:
         if is_playing_song:
             # We expect introductory text from the model in this case
             if not assistant_response_text:
-                assistant_response_text = "Here it is." # Fallback text
+                assistant_response_text = SONG_INTRO_FALLBACK
                 print("⚠️ Model did not provide intro text for song, using fallback.")
+                if streamed:
+                    await sentence_queue.put(assistant_response_text)
 
             # Execute the tool to get the song data
             song_tool_result = await tools_registry.acall_tool('play_favorite_song', {}, executor=self.process_executor)
             
             # Add tool call and result to history
-            self._add_to_history(tool_calls[0].model_dump())
-            self._add_to_history({
+            self._add_to_history(memory, tool_calls[0].model_dump())
+            self._add_to_history(memory, {
                 "type": "function_call_output",
                 "call_id": tool_calls[0].call_id,
                 "output": "[Song data was prepared for playback and sent to the user.]",
@@ -120,101 +307,139 @@ class AmbitAI:
             return {
                 "type": "speech_then_song",
                 "speech": assistant_response_text,
-                "song_data": song_tool_result
+                "song_data": song_tool_result,
+                "streamed": streamed
             }
 
         if not tool_calls:
             # No tool calls, just return the direct text response
-            return {"type": "speech", "speech": assistant_response_text}
+            return {"type": "speech", "speech": assistant_response_text, "streamed": streamed}
         
         # If we get here, the model decided to use one or more tools
         print(f"🔧 Model decided to call {len(tool_calls)} tool(s).")
         messages.extend([tc.model_dump() for tc in tool_calls])
-        self._add_to_history(tool_calls[0].model_dump())
-
-        # Execute all tool calls
         for tool_call in tool_calls:
-            function_name = tool_call.name
-            function_args = json.loads(tool_call.arguments)
+            self._add_to_history(memory, tool_call.model_dump())
 
-            if function_name == 'play_favorite_song':
-                function_args['voice_id'] = voice_id or self.voice_id
+        # Execute the tool calls: independent ones concurrently, tools flagged `serial` on their own
+        batches = []  # (serial, calls), in call order
+        for tool_call in tool_calls:
+            serial = bool(tools_registry.tool_flags.get(tool_call.name, {}).get("serial"))
+            if serial or not batches or batches[-1][0]:
+                batches.append((serial, [tool_call]))
+            else:
+                batches[-1][1].append(tool_call)
 
-            print(f"  - Executing: {function_name}({json.dumps(function_args)})")
-            function_response = await tools_registry.acall_tool(
-                function_name, function_args, executor=self.process_executor
-            )
-            print(f"  - Result: {function_response}")
+        for _, batch in batches:
+            started = time.perf_counter()
+            function_responses = await asyncio.gather(*(self._execute_tool_call(tc, voice_id, session_id) for tc in batch))
+            if len(batch) > 1:
+                print(f"  - Ran {len(batch)} tools concurrently in {(time.perf_counter() - started) * 1000:.0f}ms")
 
-            tool_result_message = {
-                "type": "function_call_output",
-                "call_id": tool_call.call_id,
-                "output": str(function_response),
-            }
-            messages.append(tool_result_message)
-            self._add_to_history(tool_result_message)
+            # Outputs are recorded in call order, whichever finished first
+            for tool_call, function_response in zip(batch, function_responses):
+                tool_result_message = {
+                    "type": "function_call_output",
+                    "call_id": tool_call.call_id,
+                    "output": str(function_response),
+                }
+                messages.append(tool_result_message)
+                self._add_to_history(memory, tool_result_message)
             
         # Second call to the model with the tool results to get a final, natural language response
         print("🤔 Getting final response from model after tool execution...")
-        final_response = await asyncio.to_thread(
-            self.openai_client.responses.create,
-            model=self.openai_model, input=messages, tools=tools
-        )
+        final_response = await self._create_response(messages, tools, sentence_queue)
 
         final_assistant_response = final_response.output_text
-        self._add_to_history({"role": "assistant", "content": final_assistant_response})
-        return {"type": "speech", "speech": final_assistant_response}
+        self._add_to_history(memory, {"role": "assistant", "content": final_assistant_response})
+        if streamed and assistant_response_text:
+            # Any text the model produced alongside its tool calls has already been spoken.
+            final_assistant_response = f"{assistant_response_text} {final_assistant_response}"
+        return {"type": "speech", "speech": final_assistant_response, "streamed": streamed}
 
-    async def get_transcription(self, audio_data: bytes, sample_rate: int) -> str:
-        """Transcribes audio using OpenAI Whisper."""
+    async def get_transcription(self, audio_data, sample_rate: int) -> str:
+        """
+        Transcribes 16-bit mono PCM (bytes or an int16 array view) with the configured
+        backend. The WAV container is built in memory; no temp files are written.
+        """
         try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                tmp_path = tmp.name
-            
-            import wave
-            with wave.open(tmp_path, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(sample_rate)
-                wf.writeframes(audio_data)
-
-            with open(tmp_path, "rb") as audio_file:
-                transcription_response = await asyncio.to_thread(
-                    self.openai_client.audio.transcriptions.create,
-                    model="whisper-1", file=audio_file, response_format="text"
-                )
-            os.remove(tmp_path)
-            return transcription_response.strip()
+            started = time.perf_counter()
+            result = await self.transcription_backend.transcribe(audio_data, sample_rate)
+            timings = dict(result.timings, total_ms=(time.perf_counter() - started) * 1000)
+            print("⏱️ Transcription timings: " + ", ".join(f"{stage}={ms:.1f}ms" for stage, ms in timings.items()))
+            return result.text
         except Exception as e:
             print(f"Transcription Error: {e}")
-            if 'tmp_path' in locals() and os.path.exists(tmp_path):
-                os.remove(tmp_path)
             return f"Error: Could not transcribe audio: {e}"
 
-    async def text_to_speech_file(self, text: str, output_path: str, voice_id: str = None) -> None:
-        """Generates speech from text and saves it to a file."""
-        try:
-            # Use custom voice_id if provided, otherwise use default
-            used_voice_id = voice_id or self.voice_id
-            print(f"🎤 Using voice ID: {used_voice_id}")
-            
-            def _generate():
-                response = self.elevenlabs_client.text_to_speech.convert(
-                    voice_id=used_voice_id,
-                    output_format="mp3_22050_32",
-                    text=text,
-                    model_id=self.elevenlabs_model,
-                    voice_settings=VoiceSettings(stability=0.5, similarity_boost=0.8, style=0.1, use_speaker_boost=True, speed=1.1)
-                )
-                with open(output_path, 'wb') as f:
-                    for chunk in response:
-                        f.write(chunk)
-            
-            await asyncio.to_thread(_generate)
-            print(f"✅ Audio saved to: {output_path}")
-        except Exception as e:
-            print(f"ElevenLabs TTS File Error: {e}")
-            raise
+    async def text_to_speech_stream(self, text: str, voice_id: str = None) -> AsyncIterator[bytes]:
+        """
+        Streams MP3 chunks (22.05 kHz) from ElevenLabs as they are synthesized.
+        Fixed phrases and short repeated texts are served from the TTS cache, and
+        stored in it once a synthesis completes (see TTSCache for admission).
+        """
+        # Use custom voice_id if provided, otherwise use default
+        used_voice_id = voice_id or self.voice_id
+        cache_key = store = None
+        if self.tts_cache.cacheable(text):
+            cache_key = tts_cache_key(text, used_voice_id, self.elevenlabs_model, TTS_OUTPUT_FORMAT, self.voice_settings)
+            audio = self.tts_cache.get(cache_key)
+            if audio is None and self.tts_cache.is_fixed(text):
+                audio = await asyncio.to_thread(self.tts_cache.load, cache_key)
+            if audio:
+                print(f"♻️ Cached TTS audio for: {text[:40]}")
+                yield audio
+                return
+            store = self.tts_cache.admission(cache_key, text)
+        print(f"🎤 Using voice ID: {used_voice_id}")
+
+        collected = []
+        async with provider_slot("elevenlabs"):
+            chunks = self.elevenlabs_client.text_to_speech.stream(
+                voice_id=used_voice_id,
+                output_format=TTS_OUTPUT_FORMAT,
+                text=text,
+                model_id=self.elevenlabs_model,
+                voice_settings=self.voice_settings
+            )
+            try:
+                async for chunk in chunks:
+                    if chunk:
+                        if store:
+                            collected.append(chunk)
+                        yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                self.cancelled_work['tts_streams'] += 1
+                raise
+            finally:
+                # Closing the SDK's generator releases the underlying HTTP stream early.
+                await chunks.aclose()
+
+        # Only complete syntheses reach this point; interrupted ones raised above
+        if collected and store == "disk":
+            try:
+                await asyncio.to_thread(self.tts_cache.put, cache_key, b"".join(collected), True)
+            except OSError as e:
+                print(f"⚠️ Could not store TTS audio in the cache: {e}")
+        elif collected:
+            self.tts_cache.put(cache_key, b"".join(collected))
+
+    async def prewarm_tts(self, phrases: List[str]):
+        """Synthesizes fixed phrases for the default voice into the TTS cache. Run as a background task at startup."""
+        self.tts_cache.add_fixed(phrases)
+        started = time.perf_counter()
+        synthesized = 0
+        for phrase in phrases:
+            key = tts_cache_key(phrase, self.voice_id, self.elevenlabs_model, TTS_OUTPUT_FORMAT, self.voice_settings)
+            if not self.tts_cache.cacheable(phrase) or key in self.tts_cache:
+                continue
+            try:
+                async for _ in self.text_to_speech_stream(phrase):
+                    pass
+                synthesized += 1
+            except Exception as e:
+                print(f"⚠️ Could not pre-warm TTS for '{phrase}': {e}")
+        print(f"♻️ TTS cache pre-warmed: {synthesized} new of {len(phrases)} phrase(s) in {time.perf_counter() - started:.1f}s")
 
 # ==============================================================================
 # 2. AMBIT WEBSOCKET SERVER CLASS
@@ -225,14 +450,56 @@ class AmbitServer:
     The 'nervous system'. Manages WebSocket connections, clients, audio buffers,
     and orchestrates the VAD and AI processing pipeline.
     """
+    SENTENCE_QUEUE_SIZE = 4  # Sentences waiting for TTS before the LLM stream is paused
+    # How long past its computed end an unacknowledged playback still counts as playing
+    PLAYBACK_ACK_GRACE_S = 2.0
+    # An item whose duration never became known (e.g. its stream broke off) expires this long after it was queued
+    PLAYBACK_UNTIMED_MAX_S = 60.0
     def __init__(self):
-        self.process_executor = ProcessPoolExecutor()
+        share_resource_tracker()  # Before any pool forks, so workers don't track shared frames themselves
+        cpu_workers = os.cpu_count() or 1
+        self.process_executor = ProcessPoolExecutor(max_workers=cpu_workers)
         self.ambit = AmbitAI(process_executor=self.process_executor)
+        # Warm workers for face recognition tools; started by main()
+        self.vision_pool = VisionWorkerPool(int(os.getenv("VISION_WORKERS", "1")))
+        # Tool lanes, in routing order: warm vision workers, a bounded lane for slow
+        # network-bound tools, processes for other CPU work, and threads for the rest
+        tools_registry.set_executor("vision", self.vision_pool.executor, max_concurrency=self.vision_pool.max_workers,
+                                    timeout=float(os.getenv("VISION_TOOL_TIMEOUT", "30")))
+        long_running_workers = int(os.getenv("LONG_RUNNING_TOOL_WORKERS", "2"))
+        tools_registry.set_executor("long_running", ThreadPoolExecutor(long_running_workers, thread_name_prefix="tool-long"),
+                                    max_concurrency=long_running_workers,
+                                    timeout=float(os.getenv("LONG_RUNNING_TOOL_TIMEOUT", "60")))
+        tools_registry.set_executor("cpu_bound", self.process_executor, max_concurrency=cpu_workers,
+                                    timeout=float(os.getenv("CPU_TOOL_TIMEOUT", "30")))
+        io_workers = int(os.getenv("IO_TOOL_WORKERS", "8"))
+        tools_registry.set_executor("io", ThreadPoolExecutor(io_workers, thread_name_prefix="tool-io"),
+                                    max_concurrency=io_workers, timeout=float(os.getenv("IO_TOOL_TIMEOUT", "15")))
+        # The camera stays open in this process while clients are connected; tools get its best recent frame
+        tools_registry.set_frame_provider(lambda require_face: camera_service.best_frame(require_face=require_face))
         self.clients = set()
         self.vad_model = None
+        self.vad_scheduler = None
         self.audio_buffer = {}
-        self.client_settings = {}  # Store per-client settings
-        self.speaking_clients = set()
+        self.vad_streams = {}  # Per-client streaming VAD state
+        self.sessions = SessionManager(
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+            max_queued_turns=int(os.getenv("SESSION_MAX_QUEUED_TURNS", "4")),
+            max_stored_messages=int(os.getenv("CONTEXT_MAX_STORED_MESSAGES", "200")),
+        )
+        self.client_sessions: Dict[str, Session] = {}  # client_id -> the session its turns run in
+        self.audio_sequence = {}  # Next expected binary audio sequence number per client
+        self.active_tts_streams = {}  # client_id -> stream id of the TTS audio currently being streamed
+        self._tts_stream_ids = itertools.count(1)
+        # Speculative transcription: start transcribing when trailing silence begins, commit at end of turn.
+        self.speculative_transcription = os.getenv("SPECULATIVE_TRANSCRIPTION", "1") != "0"
+        self.speculations = {}  # client_id -> {'start', 'end', 'task'} for the in-flight speculation
+        self.speculation_stats = {'started': 0, 'committed': 0, 'wasted': 0}
+        # Barge-in: how many turns were cancelled and how long cancellation took
+        self.barge_in_stats = {'interruptions': 0, 'turns_cancelled': 0, 'cancel_ms_total': 0.0, 'cancel_ms_max': 0.0}
+        self.speaking_clients = set()  # Clients with audio queued or playing, per `playback`
+        self.playback = {}  # client_id -> {playback id: {'queued_at', 'ends_at'}} until the client acks the end
+        self.playback_ends_at = {}  # client_id -> when everything queued so far will have finished playing
         self.setup_vad()
     
     def setup_vad(self):
@@ -240,6 +507,13 @@ class AmbitServer:
         try:
             print("🎤 Loading Silero VAD model...")
             self.vad_model = load_silero_vad()
+            # One inference thread batches frames from all clients into shared forward passes.
+            self.vad_scheduler = VADScheduler(
+                self.vad_model,
+                max_batch_size=int(os.getenv("VAD_MAX_BATCH_SIZE", "32")),
+                max_wait_ms=float(os.getenv("VAD_MAX_WAIT_MS", "5")),
+            )
+            self.vad_scheduler.start()
             print("✅ Silero VAD model loaded successfully")
         except Exception as e:
             print(f"❌ Failed to load Silero VAD: {e}")
@@ -248,28 +522,51 @@ class AmbitServer:
         """Handles a new client connection."""
         self.clients.add(websocket)
         client_id = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
-        self.audio_buffer[client_id] = []
-        self.client_settings[client_id] = {}  # Initialize client settings
+        self.audio_buffer[client_id] = AudioRingBuffer()
+        self.client_sessions[client_id] = self.sessions.attach(client_id)  # Until the client names its own session
+        camera_service.acquire()
         print(f"🔌 Web client connected: {client_id}")
         
         try:
             await websocket.send(json.dumps({'type': 'status', 'message': 'Connected to Ambit AI backend'}))
             async for message in websocket:
                 try:
+                    if isinstance(message, bytes):
+                        await self.process_binary_frame(websocket, client_id, message)
+                        continue
+
                     data = json.loads(message)
                     message_type = data.get('type')
 
                     if message_type == 'get_tool_info':
                         await self.send_tool_info(websocket)
+                    elif message_type == 'get_stats':
+                        await self.send_stats(websocket)
+                    elif message_type == 'get_readiness':
+                        await self.send_readiness(websocket)
+                    elif message_type == 'playback_ended':
+                        self._playback_ended(client_id, data.get('playbackId'))
                     elif message_type == 'configure':
-                        # Handle configuration updates
-                        self.client_settings[client_id] = {
+                        # Handle configuration updates; the audio format is negotiated once here
+                        # so audio frames don't have to repeat any settings.
+                        if data.get('sessionId'):
+                            try:
+                                self.client_sessions[client_id] = self.sessions.rename(self.client_sessions[client_id], str(data['sessionId']))
+                            except SessionBusyError as e:
+                                print(f"⚠️ Client {client_id} kept its session: {e}")
+                                await websocket.send(json.dumps({'type': 'status', 'message': f'Session not resumed: {e}'}))
+                        session = self.client_sessions[client_id]
+                        audio_format = self._negotiate_audio_format(data.get('audioFormat'))
+                        session.settings = {
                             'voiceId': data.get('voiceId'),
                             'customInstructions': data.get('customInstructions'),
                             'openaiApiKey': data.get('openaiApiKey'),
-                            'elevenlabsApiKey': data.get('elevenlabsApiKey')
+                            'elevenlabsApiKey': data.get('elevenlabsApiKey'),
+                            'audioFormat': audio_format or session.settings.get('audioFormat')
                         }
                         print(f"⚙️ Updated settings for client {client_id}: voice={data.get('voiceId')}, custom_instructions={bool(data.get('customInstructions'))}")
+                        if audio_format:
+                            await websocket.send(json.dumps({'type': 'configured', 'binaryAudio': True, 'audioFormat': audio_format}))
                     elif message_type == 'audio_stream':
                         await self.process_audio_stream(websocket, client_id, data)
                     elif message_type == 'message':
@@ -280,8 +577,9 @@ class AmbitServer:
                             'openaiApiKey': data.get('openaiApiKey'),
                             'elevenlabsApiKey': data.get('elevenlabsApiKey')
                         }
-                        self.client_settings[client_id].update({k: v for k, v in settings.items() if v is not None})
-                        await self.process_conversation_turn(websocket, client_id, data.get('text', ''))
+                        self.client_sessions[client_id].settings.update({k: v for k, v in settings.items() if v is not None})
+                        user_input = data.get('text', '')
+                        await self._submit_turn(websocket, client_id, lambda: self.process_conversation_turn(websocket, client_id, user_input))
                     # Other message types can be handled here
                 except json.JSONDecodeError:
                     await self._send_error(websocket, 'Invalid JSON received')
@@ -293,10 +591,49 @@ class AmbitServer:
             self.clients.discard(websocket)
             if client_id in self.audio_buffer:
                 del self.audio_buffer[client_id]
-            self.speaking_clients.discard(client_id)
+            self.vad_streams.pop(client_id, None)
+            self.audio_sequence.pop(client_id, None)
+            self.active_tts_streams.pop(client_id, None)
+            self._cancel_speculation(client_id)
+            self._clear_playback(client_id)
+            session = self.client_sessions.pop(client_id, None)
+            if session:
+                self.sessions.detach(session)
+            camera_service.release()
+
+    def _negotiate_audio_format(self, requested: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Validates a client's requested binary audio format, returning the accepted format or None."""
+        if not requested or not requested.get('binary'):
+            return None
+        encoding = requested.get('encoding', 'float32')
+        if encoding not in ENCODING_NAMES:
+            print(f"⚠️ Unsupported audio encoding '{encoding}', falling back to float32")
+            encoding = 'float32'
+        return {
+            'binary': True,
+            'encoding': encoding,
+            'sampleRate': int(requested.get('sampleRate', 16000)),
+            'streamingTts': bool(requested.get('streamingTts')),
+        }
+
+    async def process_binary_frame(self, websocket, client_id, message):
+        """Processes a binary frame (see ambit_protocol) carrying raw PCM audio."""
+        frame = unpack_frame(message)
+        if frame.message_type != MSG_AUDIO_IN:
+            await self._send_error(websocket, f'Unsupported binary message type: {frame.message_type}')
+            return
+
+        expected_sequence = self.audio_sequence.get(client_id)
+        if expected_sequence is not None and frame.sequence != expected_sequence:
+            print(f"⚠️ Audio frame out of sequence for {client_id}: expected {expected_sequence}, got {frame.sequence}")
+        self.audio_sequence[client_id] = (frame.sequence + 1) & 0xFFFFFFFF
+
+        audio_format = self.client_sessions[client_id].settings.get('audioFormat') or {}
+        sample_rate = frame.sample_rate or audio_format.get('sampleRate', 16000)
+        await self._ingest_audio(websocket, client_id, decode_pcm(frame.payload, frame.encoding), sample_rate)
 
     async def process_audio_stream(self, websocket, client_id, data):
-        """Processes a chunk of the continuous audio stream for VAD."""
+        """Processes a JSON/base64 chunk of the continuous audio stream (legacy clients)."""
         audio_base64 = data.get('data')
         if not audio_base64: return
         
@@ -307,114 +644,209 @@ class AmbitServer:
             'openaiApiKey': data.get('openaiApiKey'),
             'elevenlabsApiKey': data.get('elevenlabsApiKey')
         }
-        self.client_settings[client_id].update({k: v for k, v in settings.items() if v is not None})
+        self.client_sessions[client_id].settings.update({k: v for k, v in settings.items() if v is not None})
         
         audio_bytes = base64.b64decode(audio_base64)
         audio_array = np.frombuffer(audio_bytes, dtype=np.float32)
+        await self._ingest_audio(websocket, client_id, audio_array, data.get('sampleRate', 16000))
+
+    async def _ingest_audio(self, websocket, client_id, audio_array, sample_rate):
+        """Appends decoded samples to the client's buffer and runs VAD on them."""
+        # The ring buffer caps itself at 15 seconds; recreate it if the client's rate changes.
+        buffer = self.audio_buffer[client_id]
+        if buffer.sample_rate != sample_rate:
+            buffer = self.audio_buffer[client_id] = AudioRingBuffer(sample_rate)
+        buffer.extend(audio_array)
         
-        self.audio_buffer[client_id].extend(audio_array)
-        
-        sample_rate = data.get('sampleRate', 16000)
-        max_samples = sample_rate * 15
-        if len(self.audio_buffer[client_id]) > max_samples:
-            self.audio_buffer[client_id] = self.audio_buffer[client_id][-max_samples:]
-        
-        min_samples = sample_rate // 3
-        if len(self.audio_buffer[client_id]) >= min_samples:
-            await self.check_speech_with_silero(websocket, client_id, sample_rate)
+        await self.check_speech_with_silero(websocket, client_id, audio_array)
+
+    def _get_vad_stream(self, client_id, sample_rate) -> StreamingVAD:
+        """Returns the client's streaming VAD, creating it if needed."""
+        vad = self.vad_streams.get(client_id)
+        if vad is None or vad.sample_rate != sample_rate:
+            vad = self.vad_streams[client_id] = StreamingVAD(sample_rate)
+        return vad
 
-    async def check_speech_with_silero(self, websocket, client_id, sample_rate):
-        """Uses Silero VAD to detect speech and trigger a conversation turn."""
+    async def check_speech_with_silero(self, websocket, client_id, new_samples):
+        """Feeds new audio to the client's streaming Silero VAD and acts on its events."""
+        if self.vad_scheduler is None: return
+        buffer = self.audio_buffer[client_id]
+        vad = None
         try:
-            audio_data_np = np.array(self.audio_buffer[client_id], dtype=np.float32)
-            audio_tensor = torch.from_numpy(audio_data_np)
-            
-            # --- Interruption Check ---
-            # Perform a sensitive check for any speech activity if Ambit is currently speaking.
-            if client_id in self.speaking_clients:
-                interruption_check = get_speech_timestamps(
-                    audio_tensor, self.vad_model, sampling_rate=sample_rate,
-                    threshold=0.5, # Sensitive threshold
-                    min_speech_duration_ms=80 # Detect short speech segments
-                )
-                if interruption_check:
-                    # Calculate the total duration of all detected speech segments in the buffer.
-                    total_speech_samples = sum(ts['end'] - ts['start'] for ts in interruption_check)
-                    speech_duration_seconds = total_speech_samples / sample_rate
-                    
-                    # Only cancel if speech duration is long enough to be a clear interruption.
-                    if speech_duration_seconds >= 2.0:
-                        print(f"🎤 User has been speaking for {speech_duration_seconds:.2f}s. Sending cancellation signal.")
-                        await websocket.send(json.dumps({'type': 'cancel_audio'}))
-                        self.speaking_clients.discard(client_id)
-
-            speech_timestamps = get_speech_timestamps(
-                audio_tensor, self.vad_model, sampling_rate=sample_rate,
-                threshold=0.4, min_speech_duration_ms=250, min_silence_duration_ms=700
-            )
+            vad = self._get_vad_stream(client_id, buffer.sample_rate)
+            frames = vad.take_frames(new_samples)
+            if not len(frames): return
+            probs = await self.vad_scheduler.infer(vad, frames)
+            self._expire_playback(client_id)
+            events = vad.apply(probs, detect_interruption=client_id in self.speaking_clients)
 
-            if not speech_timestamps: return
+            for event in events:
+                # --- Interruption Check ---
+                # The barge-in tracker only fires once the user has spoken long enough to be a clear interruption.
+                if event['type'] == 'interruption' and client_id in self.speaking_clients:
+                    print(f"🎤 User has been speaking for {event['speech_seconds']:.2f}s. Sending cancellation signal.")
+                    await websocket.send(json.dumps({'type': 'cancel_audio'}))
+                    self._clear_playback(client_id)
+                    self.active_tts_streams.pop(client_id, None)  # Stop forwarding any TTS stream
+                    self._cancel_turn(client_id)  # Abort the LLM, TTS and tool work behind it
 
-            last_speech = speech_timestamps[-1]
-            speech_end_sample = last_speech['end']
-            silence_duration = len(self.audio_buffer[client_id]) - speech_end_sample
+                elif event['type'] == 'silence_start' and self.speculative_transcription:
+                    self._start_speculation(client_id, buffer, event)
 
-            if silence_duration > (sample_rate * 0.8):
-                speech_start_sample = speech_timestamps[0]['start']
-                speech_audio_original_sr = np.array(self.audio_buffer[client_id][speech_start_sample:speech_end_sample])
-                
-                print(f"🎤 Detected speech segment: {len(speech_audio_original_sr) / sample_rate:.2f}s")
-                self.audio_buffer[client_id] = [] # Clear buffer immediately
+                elif event['type'] == 'speech_resumed':
+                    self._cancel_speculation(client_id)
 
-                audio_int16 = (speech_audio_original_sr * 32767).astype(np.int16)
-                transcription = await self.ambit.get_transcription(audio_int16.tobytes(), sample_rate)
+                elif event['type'] == 'speech_end':
+                    speculation = self.speculations.get(client_id)
+                    if speculation and (speculation['start'], speculation['end']) == (event['start'], event['end']):
+                        # The silence held: the transcription started at its onset is the real one.
+                        del self.speculations[client_id]
+                        self.speculation_stats['committed'] += 1
+                        buffer.clear()
+                        print("⚡ Committing speculative transcription")
+                        transcription_task = speculation['task']
+                    else:
+                        self._cancel_speculation(client_id)
+                        speech_start_sample = buffer.to_buffer_index(event['start'])
+                        speech_end_sample = buffer.to_buffer_index(event['end'])
+                        audio_int16 = buffer.pcm16(speech_start_sample, speech_end_sample)
+                        if not len(audio_int16): continue
 
-                if transcription and not transcription.startswith("Error:"):
-                    await websocket.send(json.dumps({'type': 'transcription', 'text': transcription}))
-                    await self.process_conversation_turn(websocket, client_id, transcription)
+                        print(f"🎤 Detected speech segment: {len(audio_int16) / buffer.sample_rate:.2f}s")
+                        # Copy: transcription runs as a task while new audio keeps arriving.
+                        transcription_task = asyncio.create_task(
+                            self.ambit.get_transcription(audio_int16.copy(), buffer.sample_rate)
+                        )
+                        buffer.clear() # Clear buffer immediately
+
+                    # The turn waits for its transcription inside the session's turn queue,
+                    # so VAD (and barge-in detection) keeps running in the meantime.
+                    await self._submit_turn(
+                        websocket, client_id,
+                        lambda task=transcription_task: self._process_voice_turn(websocket, client_id, task),
+                        on_rejected=transcription_task.cancel,
+                    )
         except Exception as e:
             print(f"❌ Silero VAD error: {e}")
-            self.audio_buffer[client_id] = [] # Clear buffer on error
+            buffer.clear() # Clear buffer on error
+            self._cancel_speculation(client_id)
+            if vad is not None:
+                vad.reset()
+
+    def _cancel_turn(self, client_id):
+        """Cancels the client's running turn and records how long the cancellation takes to land."""
+        self.barge_in_stats['interruptions'] += 1
+        session = self.client_sessions.get(client_id)
+        task = self.sessions.cancel_turn(session) if session else None
+        if task is None:
+            return
+        started = time.perf_counter()
+
+        def record(_task):
+            cancel_ms = (time.perf_counter() - started) * 1000
+            self.barge_in_stats['turns_cancelled'] += 1
+            self.barge_in_stats['cancel_ms_total'] += cancel_ms
+            self.barge_in_stats['cancel_ms_max'] = max(self.barge_in_stats['cancel_ms_max'], cancel_ms)
+            print(f"🛑 Cancelled turn for {client_id} in {cancel_ms:.1f}ms")
+
+        task.add_done_callback(record)
+
+    def _start_speculation(self, client_id, buffer: AudioRingBuffer, event: Dict[str, Any]):
+        """Starts transcribing the utterance as it stands at the onset of trailing silence."""
+        self._cancel_speculation(client_id)
+        start = buffer.to_buffer_index(event['start'])
+        end = buffer.to_buffer_index(event['end'])
+        # Copy: the task runs later and the ring buffer's int16 scratch may be reused by then.
+        audio_int16 = buffer.pcm16(start, end).copy()
+        if not len(audio_int16): return
+        task = asyncio.create_task(self.ambit.get_transcription(audio_int16, buffer.sample_rate))
+        self.speculations[client_id] = {'start': event['start'], 'end': event['end'], 'task': task}
+        self.speculation_stats['started'] += 1
+
+    def _cancel_speculation(self, client_id):
+        """Discards a client's in-flight speculative transcription, counting it as wasted."""
+        speculation = self.speculations.pop(client_id, None)
+        if speculation:
+            speculation['task'].cancel()
+            self.speculation_stats['wasted'] += 1
+
+    async def _submit_turn(self, websocket, client_id, turn, on_rejected=None):
+        """Queues a turn on the client's session; a session runs at most one turn at a time."""
+        if not self.sessions.submit_turn(self.client_sessions[client_id], turn):
+            if on_rejected:
+                on_rejected()
+            await self._send_error(websocket, 'Still working on your previous requests, please wait.')
+
+    async def _process_voice_turn(self, websocket, client_id, transcription_task: asyncio.Task):
+        """Waits for an utterance's transcription, then runs it as a conversation turn."""
+        transcription = await transcription_task
+        if transcription and not transcription.startswith("Error:"):
+            await websocket.send(json.dumps({'type': 'transcription', 'text': transcription}))
+            await self.process_conversation_turn(websocket, client_id, transcription)
 
     async def process_conversation_turn(self, websocket, client_id, user_input):
         """Processes a full conversation turn, from user input to spoken response."""
         if not user_input: return
+        session = self.client_sessions.get(client_id)
+        if session is None: return  # Client disconnected before its turn started
         try:
             # Get client settings
-            settings = self.client_settings.get(client_id, {})
+            settings = session.settings
             custom_instructions = settings.get('customInstructions')
             voice_id = settings.get('voiceId')
-            
+
+            # Clients that accept streamed TTS get sentence-level pipelining: each sentence is
+            # synthesized and sent while the model is still generating the rest.
+            sentence_queue = None
+            speaker = None
+            if (settings.get('audioFormat') or {}).get('streamingTts'):
+                sentence_queue = asyncio.Queue(maxsize=self.SENTENCE_QUEUE_SIZE)
+                speaker = asyncio.create_task(self._speak_sentences(websocket, client_id, voice_id, sentence_queue))
+
             # Get response with custom instructions if provided
-            response_data = await self.ambit.get_response(user_input, custom_instructions, voice_id)
+            try:
+                response_data = await self.ambit.get_response(
+                    user_input, custom_instructions, voice_id,
+                    sentence_queue=sentence_queue, memory=session.memory, session_id=session.session_id
+                )
+            except BaseException:
+                if speaker:
+                    speaker.cancel()
+                raise
+            streamed = response_data.get("streamed", False)
+
+            # Show the transcript now, while any streamed sentences are still being spoken
+            response_text = response_data.get("speech")
+            if response_text:
+                await websocket.send(json.dumps({'type': 'response', 'text': response_text}))
+            if speaker:
+                await sentence_queue.put(None)  # No more sentences; wait for the last ones to be sent
+                await speaker
             
             # Handle different response types
             if response_data.get("type") == "speech":
-                response_text = response_data.get("speech")
-                if response_text:
-                    await websocket.send(json.dumps({'type': 'response', 'text': response_text}))
+                if response_text and not streamed:
                     await self.generate_and_send_audio(websocket, response_text, client_id, voice_id)
 
             elif response_data.get("type") == "speech_then_song":
                 # 1. Speak the introductory text
-                intro_text = response_data["speech"]
-                await websocket.send(json.dumps({'type': 'response', 'text': intro_text}))
-                await self.generate_and_send_audio(websocket, intro_text, client_id, voice_id)
+                intro_text = response_text
+                if not streamed:
+                    await self.generate_and_send_audio(websocket, intro_text, client_id, voice_id)
                 
-                # Estimate intro duration to avoid overlap.
-                # Average speech is ~150 WPM. Avg word is 5 chars.
-                # (len / 5) / 150 * 60 = len * 0.08
-                intro_duration_s = len(intro_text) * 0.08 + 1.0 # Add 1s buffer
-                await asyncio.sleep(intro_duration_s)
-
-                # 2. Play the song
+                # 2. Play the song. The client queues it behind the intro, so it starts
+                # the moment the intro ends instead of after a guessed delay.
                 song_tool_result = response_data["song_data"]
-                if "audio_base64" in song_tool_result:
-                    song_base64 = song_tool_result["audio_base64"]
-                    audio_url = f"data:audio/mp3;base64,{song_base64}"
-                    await websocket.send(json.dumps({'type': 'audio_ready', 'audioUrl': audio_url}))
-                    self.speaking_clients.add(client_id)
-                    print(f"🔊 Sent song for playback.")
+                if "media" in song_tool_result:
+                    # The tool only returns a handle; the audio comes from this process's media cache
+                    asset = await asyncio.to_thread(media_cache.get, song_tool_result["media"]["path"])
+                    if (settings.get('audioFormat') or {}).get('streamingTts'):
+                        await self._stream_media(websocket, client_id, asset)
+                    else:
+                        playback_id = next(self._tts_stream_ids) & 0xFFFF
+                        await websocket.send(json.dumps({'type': 'audio_ready', 'audioUrl': asset.data_url(), 'playbackId': playback_id}))
+                        self._playback_queued(client_id, playback_id, asset.duration_seconds)
+                    print(f"🔊 Sent song for playback (~{asset.duration_seconds:.1f}s).")
                 else:
                     # Handle error from tool if song file wasn't found
                     error_text = song_tool_result.get("error", "An unknown error occurred while loading the song.")
@@ -428,32 +860,157 @@ class AmbitServer:
             traceback.print_exc()
             await self._send_error(websocket, f"Error processing turn: {e}")
 
-    async def generate_and_send_audio(self, websocket, text, client_id, voice_id=None):
-        """Generates TTS audio and sends it to the client."""
-        tmp_path = None
+    async def _speak_sentences(self, websocket, client_id, voice_id, sentence_queue: asyncio.Queue):
+        """Synthesizes and sends queued sentences in order until a None sentinel arrives."""
         try:
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp_file:
-                tmp_path = tmp_file.name
-
-            await self.ambit.text_to_speech_file(text, tmp_path, voice_id)
+            while True:
+                sentence = await sentence_queue.get()
+                if sentence is None:
+                    return
+                await self.generate_and_send_audio(websocket, sentence, client_id, voice_id)
+        except asyncio.CancelledError:
+            self.ambit.cancelled_work['sentences_skipped'] += sentence_queue.qsize()
+            raise
 
-            with open(tmp_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
+    async def generate_and_send_audio(self, websocket, text, client_id, voice_id=None):
+        """Generates TTS audio and sends it to the client, streaming chunks if the client negotiated it."""
+        session = self.client_sessions.get(client_id)
+        audio_format = (session.settings.get('audioFormat') if session else None) or {}
+        try:
+            if audio_format.get('streamingTts'):
+                await self._stream_tts_audio(websocket, text, client_id, voice_id)
+                return
 
+            audio_data = b"".join([chunk async for chunk in self.ambit.text_to_speech_stream(text, voice_id)])
             audio_base64 = base64.b64encode(audio_data).decode()
             audio_url = f"data:audio/mp3;base64,{audio_base64}"
-            await websocket.send(json.dumps({'type': 'audio_ready', 'audioUrl': audio_url}))
-            self.speaking_clients.add(client_id)
+            playback_id = next(self._tts_stream_ids) & 0xFFFF
+            await websocket.send(json.dumps({'type': 'audio_ready', 'audioUrl': audio_url, 'playbackId': playback_id}))
+            self._playback_queued(client_id, playback_id, mp3_duration(audio_data))
             print(f"🔊 Sent TTS audio: {len(audio_data)} bytes")
         except ConnectionClosed:
             print("⚠️ WebSocket closed, skipping TTS generation/sending.")
-            self.speaking_clients.discard(client_id)
+            self._clear_playback(client_id)
         except Exception as e:
             print(f"❌ TTS generation error: {e}")
             await self._send_error(websocket, f'TTS generation failed: {str(e)}')
+
+    async def _stream_tts_audio(self, websocket, text, client_id, voice_id=None):
+        """Forwards ElevenLabs MP3 chunks to the client while they are synthesized."""
+        chunks = self.ambit.text_to_speech_stream(text, voice_id)
+        await self._stream_audio(websocket, client_id, chunks, 22050, "TTS audio")
+
+    async def _stream_media(self, websocket, client_id, asset: MediaAsset):
+        """Streams a cached media asset to the client as zero-copy chunks of its mapping."""
+        async def chunks():
+            for chunk in asset.chunks():
+                yield chunk
+        await self._stream_audio(websocket, client_id, chunks(), asset.sample_rate, "media",
+                                 duration_seconds=asset.duration_seconds)
+
+    async def _stream_audio(self, websocket, client_id, chunks: AsyncIterator, sample_rate: int, label: str,
+                            duration_seconds: Optional[float] = None):
+        """
+        Sends MP3 chunks to the client as binary frames as they become available,
+        framed by `audio_stream_start` / `audio_stream_end` messages (`audio_stream_abort`
+        if the source fails part way, so the client plays what arrived and moves on).
+        An interruption (`cancel_audio`) drops the stream from `active_tts_streams`,
+        which stops forwarding and closes the source (e.g. the synthesis request).
+        """
+        stream_id = next(self._tts_stream_ids) & 0xFFFF
+        self.active_tts_streams[client_id] = stream_id
+        sent_chunks = 0
+        sent_bytes = 0
+        tracker = MP3DurationTracker()  # Also times a stream that breaks off part way
+
+        try:
+            async for chunk in chunks:
+                if self.active_tts_streams.get(client_id) != stream_id:
+                    print(f"🛑 Audio stream {stream_id} cancelled after {sent_bytes} bytes")
+                    return
+                if sent_chunks == 0:
+                    start_message = {'type': 'audio_stream_start', 'streamId': stream_id, 'mimeType': 'audio/mpeg'}
+                    if duration_seconds:
+                        start_message['durationSeconds'] = duration_seconds
+                    await websocket.send(json.dumps(start_message))
+                    self._playback_queued(client_id, stream_id)
+                await websocket.send(pack_frame(MSG_TTS_AUDIO, chunk, ENCODING_MP3, sample_rate, sent_chunks, stream_id))
+                tracker.feed(chunk)
+                sent_chunks += 1
+                sent_bytes += len(chunk)
+        except Exception:
+            # The source failed mid-stream: tell the client to stop waiting for this stream
+            if self.active_tts_streams.get(client_id) == stream_id:
+                del self.active_tts_streams[client_id]
+                if sent_chunks:
+                    # The client plays what it received, so the item ends after that much audio
+                    self._playback_duration(client_id, stream_id, tracker.seconds)
+                    try:
+                        await websocket.send(json.dumps({'type': 'audio_stream_abort', 'streamId': stream_id}))
+                    except ConnectionClosed:
+                        pass
+            raise
         finally:
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            await chunks.aclose()
+
+        if self.active_tts_streams.get(client_id) == stream_id:
+            del self.active_tts_streams[client_id]
+            if sent_chunks:
+                duration = duration_seconds if duration_seconds is not None else tracker.seconds
+                self._playback_duration(client_id, stream_id, duration)
+                await websocket.send(json.dumps({'type': 'audio_stream_end', 'streamId': stream_id, 'chunks': sent_chunks, 'bytes': sent_bytes}))
+                print(f"🔊 Streamed {label}: {sent_bytes} bytes in {sent_chunks} chunks ({duration:.2f}s)")
+
+    # --- Playback State ---
+    # The client plays audio items back to back and acks each one's end (`playback_ended`).
+    # Durations come from the MP3 frame headers, so a missing ack still expires on time.
+
+    def _playback_queued(self, client_id, playback_id, duration: Optional[float] = None):
+        """Records an audio item sent to the client; the client counts as speaking until it ends."""
+        self.playback.setdefault(client_id, {})[playback_id] = {'queued_at': time.monotonic(), 'ends_at': None}
+        self.speaking_clients.add(client_id)
+        if duration is not None:
+            self._playback_duration(client_id, playback_id, duration)
+
+    def _playback_duration(self, client_id, playback_id, duration: float):
+        """Schedules an item's end: it starts when it arrived or when the previous item ends, whichever is later."""
+        item = self.playback.get(client_id, {}).get(playback_id)
+        if item is None:
+            return
+        starts_at = max(item['queued_at'], self.playback_ends_at.get(client_id, 0.0))
+        item['ends_at'] = self.playback_ends_at[client_id] = starts_at + duration
+
+    def _playback_ended(self, client_id, playback_id):
+        """Handles the client's acknowledgement that an item finished playing."""
+        items = self.playback.get(client_id)
+        if items is not None:
+            items.pop(playback_id, None)
+            if not items:
+                self._clear_playback(client_id)
+
+    def _expire_playback(self, client_id):
+        """
+        Drops items whose computed end has passed without an ack (e.g. a client that
+        never sends one), and items that never got a duration after PLAYBACK_UNTIMED_MAX_S.
+        """
+        items = self.playback.get(client_id)
+        if not items:
+            return
+        now = time.monotonic()
+        for playback_id, item in list(items.items()):
+            if item['ends_at'] is None:
+                expires_at = item['queued_at'] + self.PLAYBACK_UNTIMED_MAX_S
+            else:
+                expires_at = item['ends_at'] + self.PLAYBACK_ACK_GRACE_S
+            if now > expires_at:
+                del items[playback_id]
+        if not items:
+            self._clear_playback(client_id)
+
+    def _clear_playback(self, client_id):
+        self.playback.pop(client_id, None)
+        self.playback_ends_at.pop(client_id, None)
+        self.speaking_clients.discard(client_id)
 
     async def send_tool_info(self, websocket):
         """Sends the available tool schemas to the client."""
@@ -466,6 +1023,29 @@ class AmbitServer:
         except Exception as e:
             await self._send_error(websocket, f'Could not fetch tool info: {e}')
 
+    async def send_stats(self, websocket):
+        """Sends each subsystem's counters to the client, under its own key."""
+        barge_in = dict(self.barge_in_stats)
+        barge_in['avg_cancel_ms'] = barge_in['cancel_ms_total'] / barge_in['turns_cancelled'] if barge_in['turns_cancelled'] else 0.0
+        barge_in['cancelled_work'] = dict(self.ambit.cancelled_work)
+        stats = {
+            'vad': self.vad_scheduler.get_stats() if self.vad_scheduler else {},
+            'speculation': dict(self.speculation_stats),
+            'barge_in': barge_in,
+            'tool_lanes': tools_registry.get_lane_stats(),
+            'tool_cache': tools_registry.get_cache_stats(),
+            'tts_cache': self.ambit.tts_cache.get_stats(),
+        }
+        await websocket.send(json.dumps({'type': 'stats', 'stats': stats}))
+
+    async def send_readiness(self, websocket):
+        """Reports whether the vision workers have their models loaded."""
+        await websocket.send(json.dumps({
+            'type': 'readiness',
+            'ready': self.vision_pool.ready,
+            'vision': self.vision_pool.get_status()
+        }))
+
     async def _send_error(self, websocket, message):
         """Sends a JSON error message to the client."""
         try:
@@ -480,7 +1060,16 @@ class AmbitServer:
 async def main():
     """Initializes the server and runs it forever."""
     print("🚀 Starting Ambit AI Unified Backend Server...")
+    cleanup_stale_segments()  # Frames shared with workers by a server that crashed
     server = AmbitServer()
+    eviction_task = asyncio.create_task(server.sessions.run_eviction_loop())
+    vision_warmup_task = asyncio.create_task(server.vision_pool.warm())
+    prewarm_phrases = list(TTS_PREWARM_PHRASES)
+    prewarm_file = os.getenv("TTS_PREWARM_FILE")
+    if prewarm_file and os.path.exists(prewarm_file):
+        with open(prewarm_file, encoding="utf-8") as f:
+            prewarm_phrases += [line.strip() for line in f if line.strip()]
+    tts_prewarm_task = asyncio.create_task(server.ambit.prewarm_tts(prewarm_phrases))
 
     async with websockets_serve(
         server.handle_client,
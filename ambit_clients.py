@@ -0,0 +1,83 @@
+"""
+Ambit AI API Clients
+Process-wide registry of API clients, so every caller reuses the same connection
+pool instead of paying for a new one (and a TLS handshake) per request.
+
+The backend uses the async clients: requests run on the event loop without a
+thread each, every provider has a concurrency limit and a timeout, and
+cancelling the awaiting task (e.g. on barge-in) aborts the HTTP request. The
+sync OpenAI client remains for tools that run in worker threads or processes.
+"""
+
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+import httpx
+import openai
+from elevenlabs.client import AsyncElevenLabs
+
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+ELEVENLABS_TIMEOUT_SECONDS = float(os.getenv("ELEVENLABS_TIMEOUT_SECONDS", "30"))
+
+# Maximum in-flight requests per provider, across all sessions
+PROVIDER_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+    "elevenlabs": int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "4")),
+}
+
+_clients: Dict[Tuple[str, int, str], object] = {}
+_lock = threading.Lock()
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _get_client(kind: str, api_key: str, factory):
+    # Keyed by PID too: a client inherited through fork must not share sockets with its parent
+    key = (kind, os.getpid(), api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def get_openai_client(api_key: Optional[str] = None) -> openai.OpenAI:
+    """Returns this process's shared OpenAI client for `api_key` (default: OPENAI_API_KEY)."""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    return _get_client("openai", api_key, lambda: openai.OpenAI(api_key=api_key))
+
+
+def get_async_openai_client(api_key: Optional[str] = None) -> openai.AsyncOpenAI:
+    """Returns this process's shared async OpenAI client, with one keep-alive connection pool."""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    return _get_client("openai-async", api_key, lambda: openai.AsyncOpenAI(
+        api_key=api_key,
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        http_client=openai.DefaultAsyncHttpxClient(),
+    ))
+
+
+def get_async_elevenlabs_client(api_key: Optional[str] = None) -> AsyncElevenLabs:
+    """Returns this process's shared async ElevenLabs client, with one keep-alive connection pool."""
+    api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
+    return _get_client("elevenlabs-async", api_key, lambda: AsyncElevenLabs(
+        api_key=api_key,
+        httpx_client=httpx.AsyncClient(
+            timeout=ELEVENLABS_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=PROVIDER_CONCURRENCY["elevenlabs"] * 2),
+        ),
+    ))
+
+
+@asynccontextmanager
+async def provider_slot(provider: str):
+    """Holds one of the provider's concurrency slots for the duration of a request."""
+    semaphore = _semaphores.get(provider)
+    if semaphore is None:
+        semaphore = _semaphores[provider] = asyncio.Semaphore(PROVIDER_CONCURRENCY[provider])
+    async with semaphore:
+        yield
@@ -0,0 +1,228 @@
+"""
+Ambit AI Conversation Context
+Token-aware prompt windows over a session's history, with a rolling summary of
+the turns that no longer fit.
+"""
+
+import asyncio
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import tiktoken
+
+Message = Dict[str, Any]
+Summarizer = Callable[[Optional[str], List[Message]], Awaitable[str]]
+
+
+# ==============================================================================
+# 1. CONVERSATION MEMORY
+# ==============================================================================
+
+class ConversationMemory:
+    """
+    A session's stored history plus a cached summary of its oldest messages.
+
+    `messages[:summarized_count]` are covered by `summary`. Once the history
+    grows past `max_messages`, summarized messages are dropped from the front so
+    storage stays bounded. If summaries keep failing, whole turns are dropped
+    unsummarized: down to `max_messages` after a failure, and whenever the
+    history passes twice that.
+    """
+    def __init__(self, max_messages: int = 200):
+        self.max_messages = max_messages
+        self.messages: List[Message] = []
+        self.summary: Optional[str] = None
+        self.summarized_count = 0
+        self.dropped_unsummarized = 0
+        self._dropped = 0  # Messages removed from the front so far, to re-base in-flight summaries
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def append(self, message: Message):
+        self.messages.append(message)
+        if len(self.messages) > 2 * self.max_messages:
+            self._drop_oldest_turns()
+
+    def mark(self) -> int:
+        """A position in the history that `discard_since` can roll back to."""
+        return self._dropped + len(self.messages)
+
+    def discard_since(self, mark: int) -> int:
+        """Removes the messages appended after `mark`, except any already summarized. Returns how many."""
+        keep = max(mark - self._dropped, self.summarized_count, 0)
+        discarded = max(0, len(self.messages) - keep)
+        del self.messages[keep:]
+        return discarded
+
+    def schedule_summary(self, upto: int, summarize: Summarizer):
+        """
+        Folds messages[summarized_count:upto] into the summary in the background,
+        unless a summary update is already running. The current turn keeps using
+        the cached summary, so summarization never adds prompt latency.
+        """
+        if upto <= self.summarized_count:
+            return
+        if self._summary_task and not self._summary_task.done():
+            return
+        pending = self.messages[self.summarized_count:upto]
+        self._summary_task = asyncio.create_task(self._update_summary(upto, pending, summarize, self._dropped))
+
+    async def _update_summary(self, upto: int, pending: List[Message], summarize: Summarizer, dropped_before: int):
+        try:
+            summary = await summarize(self.summary, pending)
+        except Exception as e:
+            print(f"⚠️ Conversation summary failed: {e}")
+            self._cap()
+            if len(self.messages) > self.max_messages:
+                self._drop_oldest_turns()
+            return
+        self.summary = summary
+        rebased = upto - (self._dropped - dropped_before)
+        self.summarized_count = min(max(self.summarized_count, rebased, 0), len(self.messages))
+        self._cap()
+
+    def _cap(self):
+        """Drops the oldest already-summarized messages beyond `max_messages`."""
+        excess = min(len(self.messages) - self.max_messages, self.summarized_count)
+        if excess > 0:
+            self._drop(excess)
+
+    def _drop_oldest_turns(self):
+        """
+        Drops whole turns from the front, summarized or not, until at most
+        `max_messages` remain. Turns start at a user message, so a function call
+        never loses its output.
+        """
+        excess = len(self.messages) - self.max_messages
+        if excess <= 0:
+            return
+        cut = next((i for i in range(excess, len(self.messages)) if self.messages[i].get("role") == "user"), None)
+        if cut is None:
+            # One oversized turn: cut anywhere that doesn't separate a call from its output
+            cut = excess
+            while cut < len(self.messages) and self.messages[cut].get("type") == "function_call_output":
+                cut += 1
+        unsummarized = max(0, cut - self.summarized_count)
+        self.dropped_unsummarized += unsummarized
+        print(f"⚠️ Conversation history over its limit; dropped {cut} message(s), {unsummarized} never summarized")
+        self._drop(cut)
+
+    def _drop(self, count: int):
+        del self.messages[:count]
+        self.summarized_count = max(0, self.summarized_count - count)
+        self._dropped += count
+
+
+# ==============================================================================
+# 2. TOKEN-BUDGETED CONTEXT BUILDER
+# ==============================================================================
+
+class ContextBuilder:
+    """
+    Builds the model input for a turn: the system prompt, the cached summary (if
+    any), and the newest history messages that fit in `token_budget` tokens.
+
+    History is selected in units that are never split: a `function_call` always
+    travels with its `function_call_output`(s). Outputs whose call has already
+    left the history, and calls that never got an output (a cancelled turn), are
+    skipped, since the API rejects them. Tool outputs longer
+    than `max_tool_output_tokens` are truncated in the prompt (not in storage).
+    """
+    MESSAGE_OVERHEAD_TOKENS = 4
+    CHARS_PER_TOKEN = 4  # Estimate used when the tokenizer can't be loaded
+
+    def __init__(self, model: str, token_budget: int = 3000, max_tool_output_tokens: int = 1000):
+        self.token_budget = token_budget
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.encoding = self._load_encoding(model)
+        self.count_tokens = lru_cache(maxsize=4096)(self._count_tokens)
+
+    @staticmethod
+    def _load_encoding(model: str):
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # tiktoken fetches its vocabulary on first use; offline, estimate from length instead
+            print(f"⚠️ Tokenizer unavailable ({e}), estimating tokens from text length")
+            return None
+
+    def _count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + self.CHARS_PER_TOKEN - 1) // self.CHARS_PER_TOKEN
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def message_tokens(self, message: Message) -> int:
+        """Approximate prompt tokens for one history item."""
+        if message.get('type') == 'function_call':
+            text = f"{message.get('name', '')}({message.get('arguments', '')})"
+        elif message.get('type') == 'function_call_output':
+            text = str(message.get('output', ''))
+        else:
+            text = str(message.get('content', ''))
+        return self.count_tokens(text) + self.MESSAGE_OVERHEAD_TOKENS
+
+    def build(self, system_content: str, memory: ConversationMemory) -> Tuple[List[Message], int]:
+        """
+        Returns the input messages for the model and the history index where the
+        window starts. Everything before that index is a candidate for summarizing.
+        """
+        units = self._group_units(memory.messages, memory.summarized_count)
+        remaining = self.token_budget
+        selected: List[List[int]] = []
+        for unit in reversed(units):
+            cost = sum(self.message_tokens(self._prompt_message(memory.messages[i])) for i in unit)
+            if selected and cost > remaining:
+                break
+            selected.append(unit)  # The newest unit (the user's input) is always sent
+            remaining -= cost
+        selected.reverse()
+
+        messages = [{"role": "system", "content": system_content}]
+        if memory.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{memory.summary}"})
+        for unit in selected:
+            messages.extend(self._prompt_message(memory.messages[i]) for i in unit)
+
+        window_start = selected[0][0] if selected else len(memory.messages)
+        return messages, window_start
+
+    def _prompt_message(self, message: Message) -> Message:
+        if message.get('type') != 'function_call_output':
+            return message
+        output = str(message.get('output', ''))
+        if self.count_tokens(output) <= self.max_tool_output_tokens:
+            return message
+        if self.encoding is None:
+            truncated = output[:self.max_tool_output_tokens * self.CHARS_PER_TOKEN]
+        else:
+            truncated = self.encoding.decode(self.encoding.encode(output, disallowed_special=())[:self.max_tool_output_tokens])
+        return dict(message, output=f"{truncated} ...[truncated]")
+
+    @staticmethod
+    def _group_units(messages: List[Message], offset: int) -> List[List[int]]:
+        """Groups history indices into units, attaching tool outputs to their calls."""
+        units: List[List[int]] = []
+        call_units: Dict[str, List[int]] = {}
+        for index in range(offset, len(messages)):
+            message = messages[index]
+            if message.get('type') == 'function_call_output':
+                unit = call_units.get(message.get('call_id'))
+                if unit is not None:
+                    unit.append(index)
+                continue  # Orphaned outputs can't be sent without their call
+            unit = [index]
+            units.append(unit)
+            if message.get('type') == 'function_call':
+                call_units[message.get('call_id')] = unit
+        return [unit for unit in units if messages[unit[0]].get('type') != 'function_call' or len(unit) > 1]
+
+
+def format_for_summary(message: Message) -> str:
+    """Renders a history item as a single transcript line for the summarizer."""
+    if message.get('type') == 'function_call':
+        return f"[tool call] {message.get('name')}({message.get('arguments', '')})"
+    if message.get('type') == 'function_call_output':
+        return f"[tool result] {str(message.get('output', ''))[:500]}"
+    return f"{message.get('role', 'unknown')}: {message.get('content', '')}"
@@ -0,0 +1,189 @@
+"""
+Ambit AI Media
+Static media assets (e.g. the favorite song) loaded once and memory-mapped, plus
+MP3 header parsing used to estimate how long audio takes to play.
+"""
+
+import base64
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterator, NamedTuple, Optional
+
+# --- MP3 Frame Headers ---
+
+# Kbit/s by [MPEG-1?][bitrate index] for Layer III
+_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0),
+}
+# Hz by version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+class MP3Frame(NamedTuple):
+    sample_rate: int
+    bitrate: int  # bit/s
+    samples: int  # Samples per channel in this frame
+    length: int  # Bytes, including the header
+    mono: bool
+
+
+def parse_mp3_frame(data, offset: int) -> Optional[MP3Frame]:
+    """Parses the Layer III frame header at `offset`, or returns None if there isn't one."""
+    if offset + 4 > len(data):
+        return None
+    header = struct.unpack_from(">I", data, offset)[0]
+    if header >> 21 != 0x7FF:  # Frame sync
+        return None
+    version = (header >> 19) & 0x3
+    layer = (header >> 17) & 0x3
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 0x3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # Reserved values, or not Layer III (the only layer we produce or ship)
+    mpeg1 = version == 3
+    bitrate = _BITRATES[mpeg1][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    samples = 1152 if mpeg1 else 576
+    padding = (header >> 9) & 0x1
+    length = samples // 8 * bitrate // sample_rate + padding
+    mono = ((header >> 6) & 0x3) == 3
+    return MP3Frame(sample_rate, bitrate, samples, length, mono)
+
+
+def skip_id3(data) -> int:
+    """Returns the offset just past a leading ID3v2 tag (0 if there is none)."""
+    if len(data) >= 10 and bytes(data[:3]) == b"ID3":
+        size = 0
+        for byte in bytes(data[6:10]):
+            size = (size << 7) | (byte & 0x7F)  # Syncsafe integer
+        return 10 + size
+    return 0
+
+
+def find_first_frame(data, start: int = 0, limit: int = 64 * 1024) -> Optional[int]:
+    """Finds the first valid frame header, checking that the next frame follows it."""
+    end = min(len(data) - 4, start + limit)
+    for offset in range(start, end):
+        frame = parse_mp3_frame(data, offset)
+        if frame and (offset + frame.length >= len(data) or parse_mp3_frame(data, offset + frame.length)):
+            return offset
+    return None
+
+
+def estimate_mp3_duration(data) -> float:
+    """
+    Estimates playback seconds from the headers: the Xing/Info frame count when
+    the encoder wrote one (VBR), otherwise size / bitrate of the first frame (CBR).
+    """
+    offset = find_first_frame(data, skip_id3(data))
+    if offset is None:
+        return 0.0
+    frame = parse_mp3_frame(data, offset)
+    mpeg1 = frame.samples == 1152
+    side_info = (17 if frame.mono else 32) if mpeg1 else (9 if frame.mono else 17)
+    tag_offset = offset + 4 + side_info
+    if bytes(data[tag_offset:tag_offset + 4]) in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, tag_offset + 4)[0]
+        if flags & 0x1:
+            frame_count = struct.unpack_from(">I", data, tag_offset + 8)[0]
+            return frame_count * frame.samples / frame.sample_rate
+    return (len(data) - offset) * 8 / frame.bitrate
+
+
+class MP3DurationTracker:
+    """
+    Accumulates the exact playback length of an MP3 stream from its frame headers
+    as chunks arrive (e.g. streamed TTS, whose total length isn't known upfront).
+    """
+    def __init__(self):
+        self.seconds = 0.0
+        self.frames = 0
+        self._buffer = bytearray()
+        self._started = False
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        offset = 0
+        if not self._started:
+            if len(self._buffer) < 10:
+                return
+            offset = skip_id3(self._buffer)
+            if offset > len(self._buffer):
+                return  # Wait for the rest of the ID3 tag
+            self._started = True
+        while offset + 4 <= len(self._buffer):
+            frame = parse_mp3_frame(self._buffer, offset)
+            if frame is None:
+                offset += 1  # Not a header: resynchronize
+                continue
+            if offset + frame.length > len(self._buffer):
+                break  # Frame continues in the next chunk
+            self.seconds += frame.samples / frame.sample_rate
+            self.frames += 1
+            offset += frame.length
+        del self._buffer[:offset]
+
+
+def mp3_duration(data) -> float:
+    """Exact playback seconds of a complete MP3, summed over its frames."""
+    tracker = MP3DurationTracker()
+    tracker.feed(data)
+    return tracker.seconds
+
+
+# --- Media Cache ---
+
+class MediaAsset:
+    """A static media file, memory-mapped read-only for the life of the process."""
+    CHUNK_SIZE = 32 * 1024
+
+    def __init__(self, path: str, mime_type: str = "audio/mpeg"):
+        self.path = path
+        self.mime_type = mime_type
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.data)
+        self.duration_seconds = estimate_mp3_duration(self.data) if mime_type == "audio/mpeg" else 0.0
+        first = find_first_frame(self.data, skip_id3(self.data)) if mime_type == "audio/mpeg" else None
+        self.sample_rate = parse_mp3_frame(self.data, first).sample_rate if first is not None else 0
+        self._data_url: Optional[str] = None
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+        """Yields zero-copy views over the mapped file."""
+        view = memoryview(self.data)
+        for start in range(0, self.size, chunk_size):
+            yield view[start:start + chunk_size]
+
+    def data_url(self) -> str:
+        """The whole asset as a data URL, for clients without binary streaming (built once)."""
+        if self._data_url is None:
+            self._data_url = f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+        return self._data_url
+
+
+class MediaCache:
+    """Loads each static asset once; later requests share the same mapping."""
+    def __init__(self):
+        self.assets: Dict[str, MediaAsset] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> MediaAsset:
+        path = os.path.abspath(path)
+        asset = self.assets.get(path)
+        if asset is None:
+            with self._lock:
+                asset = self.assets.get(path)
+                if asset is None:
+                    asset = self.assets[path] = MediaAsset(path)
+                    print(f"🎞️ Cached {os.path.basename(path)}: {asset.size} bytes, ~{asset.duration_seconds:.1f}s")
+        return asset
+
+
+media_cache = MediaCache()
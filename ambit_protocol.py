@@ -0,0 +1,70 @@
+"""
+Ambit AI Binary WebSocket Protocol
+Packs and unpacks the binary frames exchanged with the web client.
+
+Every binary frame starts with a fixed 12-byte little-endian header:
+
+    uint8   message type   (see MSG_*)
+    uint8   encoding       (see ENCODING_*)
+    uint16  stream id      (groups the chunks of one TTS playback; 0 for microphone audio)
+    uint32  sample rate    (0 = use the rate negotiated in `configure`)
+    uint32  sequence number
+
+followed by the raw payload. JSON text frames are still used for control messages,
+e.g. the `audio_stream_start`/`audio_stream_end` pair around streamed TTS chunks.
+"""
+
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+HEADER = struct.Struct("<BBHII")
+
+# --- Message Types ---
+MSG_AUDIO_IN = 1  # Client microphone PCM
+MSG_TTS_AUDIO = 2  # Server TTS audio chunk
+
+# --- Payload Encodings ---
+ENCODING_FLOAT32 = 0
+ENCODING_INT16 = 1
+ENCODING_MP3 = 2
+
+ENCODING_NAMES = {
+    'float32': ENCODING_FLOAT32,
+    'int16': ENCODING_INT16,
+}
+
+
+class Frame(NamedTuple):
+    message_type: int
+    encoding: int
+    stream_id: int
+    sample_rate: int
+    sequence: int
+    payload: memoryview
+
+
+def pack_frame(message_type: int, payload: bytes, encoding: int = 0, sample_rate: int = 0,
+               sequence: int = 0, stream_id: int = 0) -> bytes:
+    """Builds a binary frame from a header and payload."""
+    return HEADER.pack(message_type, encoding, stream_id & 0xFFFF, sample_rate, sequence & 0xFFFFFFFF) + payload
+
+
+def unpack_frame(message: bytes) -> Frame:
+    """Splits a binary frame into its header fields and a zero-copy payload view."""
+    if len(message) < HEADER.size:
+        raise ValueError(f"Binary frame too short: {len(message)} bytes")
+    message_type, encoding, stream_id, sample_rate, sequence = HEADER.unpack_from(message)
+    return Frame(message_type, encoding, stream_id, sample_rate, sequence, memoryview(message)[HEADER.size:])
+
+
+def decode_pcm(payload, encoding: int) -> np.ndarray:
+    """Decodes a PCM payload into float32 samples in [-1, 1]."""
+    if encoding == ENCODING_FLOAT32:
+        return np.frombuffer(payload, dtype='<f4')
+    if encoding == ENCODING_INT16:
+        samples = np.frombuffer(payload, dtype='<i2').astype(np.float32)
+        samples *= 1 / 32768
+        return samples
+    raise ValueError(f"Unsupported PCM encoding: {encoding}")
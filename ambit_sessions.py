@@ -0,0 +1,173 @@
+"""
+Ambit AI Session Management
+Per-client conversation state, turn serialization and idle eviction.
+"""
+
+import asyncio
+import time
+import traceback
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ambit_context import ConversationMemory
+
+TurnFactory = Callable[[], Awaitable[None]]
+
+
+class SessionBusyError(Exception):
+    """Raised when a connection can't move to another session because either one is in use."""
+
+
+class Session:
+    """
+    Conversation state for one client (or one client-provided session ID that
+    survives reconnects): its own conversation memory, settings, a lock guarding it,
+    and a queue of pending turns drained by a single worker task, so a session
+    never has more than one turn in flight.
+    """
+    def __init__(self, session_id: str, max_queued_turns: int, max_stored_messages: int = 200):
+        self.session_id = session_id
+        self.memory = ConversationMemory(max_stored_messages)
+        self.settings: Dict[str, Any] = {}
+        self.lock = asyncio.Lock()
+        self.turns: asyncio.Queue = asyncio.Queue(maxsize=max_queued_turns)
+        self.worker: Optional[asyncio.Task] = None
+        self.current_turn: Optional[asyncio.Task] = None
+        self.connections = 0
+        self.last_active = time.monotonic()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        """True while a turn is running or queued."""
+        return (self.current_turn is not None and not self.current_turn.done()) or not self.turns.empty()
+
+    def drop_pending_turns(self) -> int:
+        """Discards queued (not yet started) turns and returns how many were dropped."""
+        dropped = 0
+        while not self.turns.empty():
+            self.turns.get_nowait()
+            self.turns.task_done()
+            dropped += 1
+        return dropped
+
+
+class SessionManager:
+    """
+    Owns every live Session. Turns for different sessions run fully in parallel;
+    turns within a session run one at a time in submission order. Sessions without
+    connections are evicted once idle for longer than `ttl_seconds`.
+    """
+    def __init__(self, ttl_seconds: float = 1800, max_queued_turns: int = 4, max_stored_messages: int = 200):
+        self.ttl_seconds = ttl_seconds
+        self.max_queued_turns = max_queued_turns
+        self.max_stored_messages = max_stored_messages
+        self.sessions: Dict[str, Session] = {}
+
+    def attach(self, session_id: str) -> Session:
+        """Returns the session for `session_id`, creating it if needed, and counts a new connection."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = Session(session_id, self.max_queued_turns, self.max_stored_messages)
+            print(f"🧵 Created session {session_id}")
+        session.connections += 1
+        session.touch()
+        return session
+
+    def detach(self, session: Session):
+        """Counts a closed connection. Queued turns are dropped once no connection is left to answer."""
+        session.connections = max(0, session.connections - 1)
+        session.touch()
+        if session.connections == 0:
+            dropped = session.drop_pending_turns()
+            if dropped:
+                print(f"🗑️ Dropped {dropped} queued turn(s) for disconnected session {session.session_id}")
+
+    def rename(self, session: Session, new_session_id: str) -> Session:
+        """
+        Moves a connection onto a client-chosen session ID (e.g. to resume after a
+        reconnect). If that session already exists, its state is kept and returned.
+
+        Raises SessionBusyError, leaving the connection where it was, if the target
+        session still has a connection (e.g. the same ID open in another tab) or a
+        turn in flight, or if the connection's own session has a turn in flight.
+        """
+        if new_session_id == session.session_id:
+            return session
+        if session.busy:
+            raise SessionBusyError(f"session {session.session_id} has a turn in progress")
+        target = self.sessions.get(new_session_id)
+        if target is not None and (target.connections or target.busy):
+            raise SessionBusyError(f"session {new_session_id} is in use by another connection")
+        self.detach(session)
+        if session.connections == 0 and not session.memory.messages and self.sessions.get(session.session_id) is session:
+            self._close(session)
+        return self.attach(new_session_id)
+
+    def submit_turn(self, session: Session, turn: TurnFactory) -> bool:
+        """Queues a turn for the session. Returns False if the session's turn queue is full."""
+        try:
+            session.turns.put_nowait(turn)
+        except asyncio.QueueFull:
+            return False
+        session.touch()
+        if session.worker is None or session.worker.done():
+            session.worker = asyncio.create_task(self._run_turns(session))
+        return True
+
+    def cancel_turn(self, session: Session) -> Optional[asyncio.Task]:
+        """Cancels the session's running turn (e.g. on barge-in). Returns the cancelled task, if any."""
+        task = session.current_turn
+        if task is None or task.done():
+            return None
+        task.cancel()
+        return task
+
+    async def _run_turns(self, session: Session):
+        while True:
+            turn = await session.turns.get()
+            try:
+                async with session.lock:
+                    # Each turn is its own task so it can be cancelled without stopping the worker
+                    task = session.current_turn = asyncio.create_task(turn())
+                    try:
+                        await asyncio.wait({task})
+                    except asyncio.CancelledError:
+                        task.cancel()
+                        raise
+                if task.cancelled():
+                    print(f"🛑 Turn cancelled for session {session.session_id}")
+                elif task.exception():
+                    e = task.exception()
+                    print(f"❌ Error in turn for session {session.session_id}: {e}")
+                    traceback.print_exception(type(e), e, e.__traceback__)
+            finally:
+                session.current_turn = None
+                session.turns.task_done()
+                session.touch()
+
+    def evict_idle(self) -> int:
+        """Closes sessions with no connections that have been idle past the TTL."""
+        now = time.monotonic()
+        expired = [
+            session for session in self.sessions.values()
+            if session.connections == 0 and now - session.last_active > self.ttl_seconds
+        ]
+        for session in expired:
+            self._close(session)
+        if expired:
+            print(f"🧹 Evicted {len(expired)} idle session(s)")
+        return len(expired)
+
+    async def run_eviction_loop(self, interval_seconds: float = 60):
+        """Periodically evicts idle sessions; run as a background task."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            self.evict_idle()
+
+    def _close(self, session: Session):
+        self.sessions.pop(session.session_id, None)
+        session.drop_pending_turns()
+        if session.worker and not session.worker.done():
+            session.worker.cancel()
@@ -0,0 +1,134 @@
+"""
+Ambit AI Shared Memory
+Hands large NumPy arrays (camera frames, audio buffers) to worker processes
+through shared memory, so only a small handle is pickled across the process
+boundary instead of the whole array.
+"""
+
+import os
+import re
+import itertools
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+
+SEGMENT_PREFIX = "ambit_"
+SHM_DIR = "/dev/shm"  # Where POSIX shared memory segments are visible on Linux
+# Arrays smaller than this are cheaper to pickle than to map
+MIN_SHARED_BYTES = int(os.getenv("SHARED_MEMORY_MIN_BYTES", str(64 * 1024)))
+
+_segment_ids = itertools.count()
+
+
+class SharedArray(NamedTuple):
+    """Picklable handle to an array living in a shared memory segment."""
+    name: str
+    shape: tuple
+    dtype: str
+
+
+# --- Server Side ---
+
+def share_resource_tracker():
+    """
+    Starts the resource tracker now. Call it before creating any process pool:
+    workers forked afterwards inherit this tracker instead of starting their own,
+    which would claim every segment they attach and warn about them at exit.
+    """
+    resource_tracker.ensure_running()
+
+
+def export_array(array: np.ndarray) -> Tuple[SharedArray, shared_memory.SharedMemory]:
+    """Copies `array` into a new segment. The caller owns the segment and must `release` it."""
+    # The owning PID in the name lets a restarted server find segments leaked by a crash
+    name = f"{SEGMENT_PREFIX}{os.getpid()}_{next(_segment_ids)}"
+    segment = shared_memory.SharedMemory(name=name, create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    return SharedArray(name, array.shape, array.dtype.str), segment
+
+
+def release(segment: shared_memory.SharedMemory):
+    """Unmaps and removes a segment. A worker still using it keeps its mapping until it closes it."""
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def shared_arguments(kwargs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields `kwargs` with every large array replaced by a SharedArray handle, and
+    removes the segments on exit, whether the worker finished, failed or crashed.
+    """
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        shared = {}
+        for key, value in kwargs.items():
+            if isinstance(value, np.ndarray) and value.nbytes >= MIN_SHARED_BYTES:
+                value, segment = export_array(value)
+                segments.append(segment)
+            shared[key] = value
+        yield shared
+    finally:
+        for segment in segments:
+            release(segment)
+
+
+def cleanup_stale_segments() -> int:
+    """Removes segments left behind by server processes that are no longer running."""
+    if not os.path.isdir(SHM_DIR):
+        return 0
+    removed = 0
+    for filename in os.listdir(SHM_DIR):
+        match = re.fullmatch(rf"{SEGMENT_PREFIX}(\d+)_\d+", filename)
+        if not match or _pid_alive(int(match.group(1))):
+            continue
+        try:
+            os.remove(os.path.join(SHM_DIR, filename))
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        print(f"🧹 Removed {removed} stale shared memory segment(s)")
+    return removed
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# --- Worker Side ---
+
+def _attach(handle: SharedArray) -> Tuple[np.ndarray, shared_memory.SharedMemory]:
+    # Workers share the server's resource tracker (see `share_resource_tracker`), so the
+    # registration made here is the server's own: it unlinks the segment, or the tracker does if it dies
+    segment = shared_memory.SharedMemory(name=handle.name)
+    return np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=segment.buf), segment
+
+
+def call_with_shared_arrays(func: Callable, **kwargs) -> Any:
+    """Runs in the worker: maps SharedArray arguments back to arrays (no copy) and calls `func`."""
+    segments = []
+    try:
+        for key, value in kwargs.items():
+            if isinstance(value, SharedArray):
+                kwargs[key], segment = _attach(value)
+                segments.append(segment)
+        return func(**kwargs)
+    finally:
+        kwargs.clear()  # Drop the views so the mappings can close
+        for segment in segments:
+            try:
+                segment.close()
+            except BufferError:
+                pass  # The tool kept a reference; the mapping goes away with it
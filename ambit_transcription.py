@@ -0,0 +1,92 @@
+"""
+Ambit AI Transcription Backends
+Pluggable speech-to-text backends used by AmbitAI.get_transcription.
+
+Every backend receives 16-bit mono PCM (bytes or an int16 NumPy view, e.g. a
+slice of the client's ring buffer) and returns a TranscriptionResult with
+per-stage timings. Audio is consumed before the first `await`, so callers may
+pass views of buffers that are reused afterwards.
+"""
+
+import io
+import os
+import time
+import wave
+from abc import ABC, abstractmethod
+from typing import Dict, NamedTuple
+
+import openai
+
+from ambit_clients import provider_slot
+
+
+class TranscriptionResult(NamedTuple):
+    text: str
+    timings: Dict[str, float]  # Stage name -> milliseconds
+
+
+def encode_wav(pcm16, sample_rate: int) -> bytes:
+    """Wraps 16-bit mono PCM in a WAV container entirely in memory."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm16)
+    return buffer.getvalue()
+
+
+class TranscriptionBackend(ABC):
+    """Base class for speech-to-text backends."""
+    name = "base"
+
+    @abstractmethod
+    async def transcribe(self, pcm16, sample_rate: int) -> TranscriptionResult:
+        """Transcribes 16-bit mono PCM sampled at `sample_rate`."""
+
+
+class OpenAITranscriptionBackend(TranscriptionBackend):
+    """Sends an in-memory WAV to the OpenAI transcription endpoint."""
+    name = "openai"
+
+    def __init__(self, client: openai.AsyncOpenAI, model: str = "whisper-1"):
+        self.client = client
+        self.model = model
+
+    async def transcribe(self, pcm16, sample_rate: int) -> TranscriptionResult:
+        started = time.perf_counter()
+        wav_bytes = encode_wav(pcm16, sample_rate)
+        encoded = time.perf_counter()
+
+        async with provider_slot("openai"):
+            response = await self.client.audio.transcriptions.create(
+                model=self.model, file=("speech.wav", wav_bytes, "audio/wav"), response_format="text"
+            )
+        finished = time.perf_counter()
+        return TranscriptionResult(response.strip(), {
+            'encode_ms': (encoded - started) * 1000,
+            'request_ms': (finished - encoded) * 1000,
+        })
+
+
+class StubTranscriptionBackend(TranscriptionBackend):
+    """Local backend that returns a fixed text without any network call (for offline runs)."""
+    name = "stub"
+
+    def __init__(self, text: str = "Hello."):
+        self.text = text
+
+    async def transcribe(self, pcm16, sample_rate: int) -> TranscriptionResult:
+        started = time.perf_counter()
+        encode_wav(pcm16, sample_rate)  # Exercise the same encoding path as the real backend
+        return TranscriptionResult(self.text, {'encode_ms': (time.perf_counter() - started) * 1000})
+
+
+def create_transcription_backend(openai_client: openai.AsyncOpenAI) -> TranscriptionBackend:
+    """Builds the backend selected by the TRANSCRIPTION_BACKEND environment variable."""
+    backend = os.getenv("TRANSCRIPTION_BACKEND", "openai")
+    if backend == "stub":
+        return StubTranscriptionBackend(os.getenv("TRANSCRIPTION_STUB_TEXT", "Hello."))
+    if backend != "openai":
+        print(f"⚠️ Unknown transcription backend '{backend}', using OpenAI")
+    return OpenAITranscriptionBackend(openai_client, os.getenv("TRANSCRIPTION_MODEL", "whisper-1"))
@@ -0,0 +1,175 @@
+"""
+Ambit AI TTS Cache
+Content-addressed cache of synthesized speech, so fixed phrases and common
+short replies are played from memory or disk instead of being synthesized again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+
+def tts_cache_key(text: str, voice_id: str, model_id: str, output_format: str, voice_settings: Any) -> str:
+    """Hashes everything that changes the audio: the text, voice, model, format and voice settings."""
+    settings = voice_settings.model_dump() if hasattr(voice_settings, "model_dump") else dict(voice_settings or {})
+    payload = json.dumps({
+        "text": text,
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "output_format": output_format,
+        "voice_settings": settings,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two tiers keyed by `tts_cache_key`: an in-memory LRU bounded by
+    `memory_max_bytes`, and a directory of MP3 files bounded by `disk_max_bytes`,
+    evicting the least recently used files first. Disk methods block, so call
+    them from a thread.
+
+    Only fixed phrases (e.g. the pre-warm list) are written to disk. Other short
+    texts are kept in memory once they have been synthesized `admit_after` times,
+    so ordinary conversation audio is neither written out nor kept for one-offs.
+    """
+    SEEN_MAX_ENTRIES = 4096  # Texts whose repeat count is tracked for admission
+
+    def __init__(self, directory: str, memory_max_bytes: int, disk_max_bytes: int, max_text_chars: int = 80,
+                 admit_after: int = 2, fixed_texts: Iterable[str] = ()):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.max_text_chars = max_text_chars
+        self.admit_after = admit_after
+        self.fixed_texts = set(fixed_texts)
+        self.seen: "OrderedDict[str, int]" = OrderedDict()  # key -> times synthesized, most recent last
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_bytes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stored": 0, "persisted": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Disk index (key -> size), least recently used first
+        self.disk: "OrderedDict[str, int]" = OrderedDict()
+        entries = []
+        for filename in os.listdir(directory):
+            if filename.endswith(".mp3"):
+                stat = os.stat(os.path.join(directory, filename))
+                entries.append((stat.st_mtime, filename[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+        self.disk_bytes = sum(self.disk.values())
+
+    def add_fixed(self, texts: Iterable[str]):
+        """Marks phrases as fixed: they are cached on first synthesis and kept on disk."""
+        with self._lock:
+            self.fixed_texts.update(texts)
+
+    def is_fixed(self, text: str) -> bool:
+        return text in self.fixed_texts
+
+    def cacheable(self, text: str) -> bool:
+        """Long replies are rarely repeated word for word, so only fixed phrases and short texts are considered."""
+        return self.is_fixed(text) or 0 < len(text) <= self.max_text_chars
+
+    def admission(self, key: str, text: str) -> Optional[str]:
+        """
+        Records a miss and says where its audio should be stored once synthesized:
+        "disk" for fixed phrases, "memory" for a text seen `admit_after` times, else None.
+        """
+        with self._lock:
+            self.stats["misses"] += 1
+            if self.is_fixed(text):
+                return "disk"
+            count = self.seen.pop(key, 0) + 1
+            self.seen[key] = count
+            while len(self.seen) > self.SEEN_MAX_ENTRIES:
+                self.seen.popitem(last=False)
+            return "memory" if count >= self.admit_after else None
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self.memory or key in self.disk
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Looks in the memory tier only (never blocks)."""
+        with self._lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+        return data
+
+    def load(self, key: str) -> Optional[bytes]:
+        """Looks in the disk tier, promoting a hit to memory."""
+        with self._lock:
+            if key not in self.disk:
+                return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))  # Mark as recently used for eviction order
+        except OSError:
+            with self._lock:
+                self._forget_disk(key)
+            return None
+        with self._lock:
+            self.disk.move_to_end(key)
+            self.stats["disk_hits"] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes, persist: bool = False):
+        """Stores audio in memory and, with `persist` (which blocks on file I/O), on disk."""
+        with self._lock:
+            self._remember(key, data)
+            self.seen.pop(key, None)
+            self.stats["stored"] += 1
+        if not persist:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)  # Readers never see a partial file
+        with self._lock:
+            self._forget_disk(key)
+            self.disk[key] = len(data)
+            self.disk_bytes += len(data)
+            self.stats["persisted"] += 1
+            stale = []
+            while self.disk_bytes > self.disk_max_bytes and len(self.disk) > 1:
+                stale_key = next(iter(self.disk))
+                self._forget_disk(stale_key)
+                stale.append(stale_key)
+                self.stats["evicted"] += 1
+        for stale_key in stale:
+            try:
+                os.remove(self._path(stale_key))
+            except OSError:
+                pass
+
+    def _remember(self, key: str, data: bytes):
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        self.memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.memory_max_bytes and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _forget_disk(self, key: str):
+        size = self.disk.pop(key, None)
+        if size is not None:
+            self.disk_bytes -= size
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, memory_entries=len(self.memory), memory_bytes=self.memory_bytes,
+                        disk_entries=len(self.disk), disk_bytes=self.disk_bytes)
@@ -1,27 +1,19 @@
-import base64
+import os
 from .registry import tools_registry
 
 AUDIO_FILE_PATH = "assets/Favsong.mp3"
 
 def play_favorite_song():
     """
-    Prepares Ambit's favorite song for playback by loading and encoding it.
-    The actual playback is handled by the main server, allowing for interruption.
+    Prepares Ambit's favorite song for playback by returning a handle to it.
+    The server streams the audio from its media cache, allowing for interruption,
+    so no audio bytes pass through this function.
     This function should be called after the AI has already generated its introductory text.
     """
-    try:
-        with open(AUDIO_FILE_PATH, "rb") as audio_file:
-            audio_data = audio_file.read()
-        
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-        
-        # Return a dictionary that the backend can identify and process
-        return {"is_song": True, "audio_base64": audio_base64}
-
-    except FileNotFoundError:
+    if not os.path.isfile(AUDIO_FILE_PATH):
         return {"error": f"Song file not found at {AUDIO_FILE_PATH}."}
-    except Exception as e:
-        return {"error": f"Error loading song: {str(e)}"}
+    # Return a dictionary that the backend can identify and process
+    return {"is_song": True, "media": {"id": "favorite_song", "path": AUDIO_FILE_PATH}}
 
 
 # --- OpenAI Schema and Registration ---
@@ -1,27 +1,258 @@
 """
 Shared camera utility functions for Ambit AI tools.
 """
+import os
 import cv2
 import time
-from typing import Any
+import threading
+from collections import deque
+from typing import Any, Optional, Tuple
 
-def capture_image() -> (Any, str):
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+# Frames scoring at least this (0-1) are good enough to use right away
+QUALITY_THRESHOLD = float(os.getenv("CAMERA_QUALITY_THRESHOLD", "0.6"))
+SHARPNESS_TARGET = 100.0  # Laplacian variance treated as fully sharp at the scoring resolution
+SCORING_WIDTH = 320
+
+
+# --- Frame Sources ---
+
+class _ImageSource:
+    """Serves a still image as if it were a camera (for testing without hardware)."""
+    def __init__(self, path: str, fps: float = 15.0):
+        self.frame = cv2.imread(path)
+        self.interval = 1.0 / fps
+
+    def isOpened(self) -> bool:
+        return self.frame is not None
+
+    def read(self):
+        time.sleep(self.interval)
+        return True, self.frame.copy()
+
+    def release(self):
+        pass
+
+
+class _VideoFileSource:
+    """Plays a video file in a loop at its own frame rate (for testing without hardware)."""
+    def __init__(self, path: str):
+        self.capture = cv2.VideoCapture(path)
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 15.0
+        self.interval = 1.0 / fps
+
+    def isOpened(self) -> bool:
+        return self.capture.isOpened()
+
+    def read(self):
+        time.sleep(self.interval)
+        ret, frame = self.capture.read()
+        if not ret:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return ret, frame
+
+    def release(self):
+        self.capture.release()
+
+
+def _open_source(source: str):
+    """Opens a device index ("0"), an image file or a video file. Returns (source, is_device)."""
+    if source.isdigit():
+        # Use 0 for default webcam, or change if you have multiple cameras
+        return cv2.VideoCapture(int(source)), True
+    if source.lower().endswith(IMAGE_EXTENSIONS):
+        return _ImageSource(source), False
+    return _VideoFileSource(source), False
+
+
+# --- Frame Quality ---
+
+_face_detector = None
+
+
+def _detect_faces(gray) -> bool:
+    """Cheap Haar-cascade face check. Treated as passing if this OpenCV build has no cascades."""
+    global _face_detector
+    if _face_detector is None:
+        if not hasattr(cv2, "CascadeClassifier"):
+            print("⚠️ OpenCV build has no Haar cascades; skipping the face presence check")
+            _face_detector = False
+        else:
+            _face_detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    if _face_detector is False:
+        return True
+    return len(_face_detector.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=4, minSize=(40, 40))) > 0
+
+
+def score_frame(frame, require_face: bool = False) -> float:
+    """
+    Scores a frame from 0 to 1 on sharpness (Laplacian variance) and exposure
+    (mean brightness near mid-grey, few clipped pixels), on a downscaled greyscale
+    copy. With `require_face`, frames without a detectable face score 0.
     """
-    Captures an image from the default webcam.
+    height, width = frame.shape[:2]
+    if width > SCORING_WIDTH:
+        frame = cv2.resize(frame, (SCORING_WIDTH, height * SCORING_WIDTH // width), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+    sharpness = min(1.0, cv2.Laplacian(gray, cv2.CV_64F).var() / SHARPNESS_TARGET)
+    clipped = np.count_nonzero((gray < 10) | (gray > 245)) / gray.size
+    exposure = (1.0 - abs(float(gray.mean()) - 128.0) / 128.0) * (1.0 - clipped)
+    score = 0.6 * sharpness + 0.4 * exposure
+
+    if require_face and not _detect_faces(gray):
+        return 0.0
+    return score
+
+
+# --- Capture Service ---
+
+class CameraService:
+    """
+    Keeps the camera open in a background thread and stores the newest frames in
+    a small ring buffer, so tools get a frame instantly instead of opening the
+    device and waiting for auto-exposure on every call.
+
+    The device stays open while any client holds it (`acquire`/`release`) and is
+    released once nobody has used it for `idle_timeout` seconds. The source is a
+    device index, an image path or a video path (CAMERA_SOURCE, default "0").
+    """
+    def __init__(self, source: Optional[str] = None, buffer_size: int = 8,
+                 idle_timeout: float = 30.0, warmup_seconds: float = 1.0):
+        self.source = source if source is not None else os.getenv("CAMERA_SOURCE", "0")
+        self.frames = deque(maxlen=buffer_size)  # (timestamp, frame) pairs, newest last
+        self.idle_timeout = idle_timeout
+        self.warmup_seconds = warmup_seconds
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.error: Optional[str] = None
+        self._ready_at: Optional[float] = None
+        self._running = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Marks a client as connected and opens the device ahead of the first request."""
+        with self._condition:
+            self.users += 1
+        self._ensure_running()
+
+    def release(self):
+        """Marks a client as gone; the device closes after the idle timeout."""
+        with self._condition:
+            self.users = max(0, self.users - 1)
+            self.last_used = time.monotonic()
+
+    def latest_frame(self, timeout: float = 5.0) -> Tuple[Any, Optional[str]]:
+        """Returns the newest frame (once exposure has settled) and an error message if none is available."""
+        self.last_used = time.monotonic()
+        self._ensure_running()
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._has_settled_frame():
+                remaining = deadline - time.monotonic()
+                if self.error or not self._running or remaining <= 0:
+                    return None, self.error or "Sorry, I couldn't capture an image from your camera."
+                self._condition.wait(remaining)
+            return self.frames[-1][1], None
+
+    def best_frame(self, require_face: bool = False, threshold: float = QUALITY_THRESHOLD,
+                   timeout: float = 2.0) -> Tuple[Any, Optional[str]]:
+        """
+        Scores frames as they arrive (including while a freshly opened camera is
+        still adjusting) and returns the first one scoring at least `threshold`.
+        If none does before `timeout`, returns the best frame seen.
+        """
+        self.last_used = time.monotonic()
+        self._ensure_running()
+        started = time.monotonic()
+        deadline = started + timeout
+        best_score, best_frame = -1.0, None
+        last_checked = 0.0
+        while True:
+            with self._condition:
+                self.last_used = time.monotonic()
+                new_frames = [(t, frame) for t, frame in self.frames if t > last_checked]
+                if not new_frames:
+                    remaining = deadline - time.monotonic()
+                    if self.error or not self._running or remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                    continue
+            for t, frame in new_frames:
+                last_checked = t
+                score = score_frame(frame, require_face)
+                if score > best_score:
+                    best_score, best_frame = score, frame
+                if score >= threshold:
+                    print(f"📷 Frame scored {score:.2f} after {(time.monotonic() - started) * 1000:.0f}ms")
+                    return frame, None
+            if time.monotonic() >= deadline:
+                break
+
+        if best_frame is None:
+            return None, self.error or "Sorry, I couldn't capture an image from your camera."
+        print(f"📷 No frame reached {threshold:.2f}; using the best ({best_score:.2f})")
+        return best_frame, None
+
+    def _has_settled_frame(self) -> bool:
+        return bool(self.frames) and self._ready_at is not None and self.frames[-1][0] >= self._ready_at
+
+    def _ensure_running(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self.error = None
+        threading.Thread(target=self._run, name="camera-capture", daemon=True).start()
+
+    def _run(self):
+        capture, is_device = _open_source(self.source)
+        if not capture.isOpened():
+            with self._condition:
+                self.error = "Sorry, I can't access your camera right now."
+                self._running = False
+                self._condition.notify_all()
+            capture.release()
+            return
+
+        print(f"📷 Camera opened ({self.source})")
+        # Give a real camera a moment to auto-adjust exposure and focus
+        self._ready_at = time.monotonic() + (self.warmup_seconds if is_device else 0.0)
+        try:
+            while True:
+                with self._condition:
+                    if self.users == 0 and time.monotonic() - self.last_used > self.idle_timeout:
+                        break
+                ret, frame = capture.read()
+                with self._condition:
+                    if not ret:
+                        self.error = "Sorry, I couldn't capture an image from your camera."
+                        break
+                    self.frames.append((time.monotonic(), frame))
+                    self._condition.notify_all()
+        finally:
+            # Always release the camera resource
+            capture.release()
+            with self._condition:
+                self.frames.clear()
+                self._ready_at = None
+                self._running = False
+                self._condition.notify_all()
+            print("📷 Camera released")
+
+
+camera_service = CameraService(idle_timeout=float(os.getenv("CAMERA_IDLE_TIMEOUT", "30")))
+
+
+def capture_image(best: bool = False, require_face: bool = False) -> (Any, str):
+    """
+    Returns the newest frame from the shared camera service, or with `best` the
+    first frame that scores well on sharpness, exposure and (optionally) face presence.
     Returns the image frame and an error message if something fails.
     """
-    # Use 0 for default webcam, or change if you have multiple cameras
-    cap = cv2.VideoCapture(0) 
-    if not cap.isOpened():
-        return None, "Sorry, I can't access your camera right now."
-    
-    try:
-        # Give the camera a moment to auto-adjust exposure and focus
-        time.sleep(1)
-        ret, frame = cap.read()
-        if not ret:
-            return None, "Sorry, I couldn't capture an image from your camera."
-        return frame, None
-    finally:
-        # Always release the camera resource
-        cap.release() 
\ No newline at end of file
+    if best:
+        return camera_service.best_frame(require_face=require_face)
+    return camera_service.latest_frame()
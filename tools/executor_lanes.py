@@ -0,0 +1,110 @@
+"""
+Executor Lanes for Ambit AI Tools
+Bounded execution lanes (an executor plus admission control) that sync tools run in.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ToolTimeoutError(Exception):
+    """Raised when a tool doesn't finish within its lane's (or its own) timeout."""
+
+
+class ExecutorLane:
+    """
+    Runs sync tools in one executor with at most `max_concurrency` jobs submitted
+    at a time, so the backlog waits here, where it can be measured, rather than
+    invisibly inside the executor. Each tool also gets its own cap (`per_tool`,
+    or the tool's `max_concurrency` flag).
+
+    A job that times out or whose caller is cancelled keeps its slot until the
+    executor actually finishes it, since executor work can't be interrupted.
+    """
+    def __init__(self, name: str, executor: Executor, max_concurrency: int,
+                 timeout: Optional[float] = None, per_tool: Optional[int] = None):
+        self.name = name
+        self.executor = executor
+        self.out_of_process = isinstance(executor, ProcessPoolExecutor)  # Arguments are pickled to workers
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.per_tool = per_tool or max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tool_slots: Dict[str, asyncio.Semaphore] = {}
+        self.queued = 0
+        self.running = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.started = 0
+
+    def _slots_for(self, tool_name: str, cap: Optional[int]) -> asyncio.Semaphore:
+        slots = self._tool_slots.get(tool_name)
+        if slots is None:
+            slots = self._tool_slots[tool_name] = asyncio.Semaphore(min(cap or self.per_tool, self.max_concurrency))
+        return slots
+
+    async def run(self, tool_name: str, func: Callable[[], Any], cap: Optional[int] = None,
+                  timeout: Optional[float] = None) -> Any:
+        """Waits for a slot, runs `func` in the executor and returns its result."""
+        tool_slots = self._slots_for(tool_name, cap)
+        timeout = timeout if timeout is not None else self.timeout
+
+        self.queued += 1
+        if tool_slots.locked() or self._slots.locked():
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        queued_at = time.perf_counter()
+        try:
+            await tool_slots.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                tool_slots.release()
+                raise
+        finally:
+            self.queued -= 1
+        self.wait_ms_total += (time.perf_counter() - queued_at) * 1000
+        self.started += 1
+
+        def _finished(future):
+            self.running -= 1
+            self._slots.release()
+            tool_slots.release()
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+        self.running += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, func)
+        except BaseException:
+            self.running -= 1
+            self._slots.release()
+            tool_slots.release()
+            raise
+        future.add_done_callback(_finished)
+
+        try:
+            # Shielded: a timeout or cancellation abandons the job rather than the slot bookkeeping
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ToolTimeoutError(f"'{tool_name}' timed out after {timeout:g}s in the {self.name} lane")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "queued": self.queued,
+            "running": self.running,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": self.wait_ms_total / self.started if self.started else 0.0,
+        }
@@ -6,169 +6,304 @@ Refactored for clarity, robustness, and correct concurrent execution.
 
 import os
 import cv2
+import json
 import shutil
 import tempfile
+import threading
 import time
-import pickle
-from typing import Dict, Any
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 from deepface import DeepFace
 from .camera_utils import capture_image
 
 # --- Directory Setup ---
 FACES_DIR = "faces"
-KNOWN_FACES_FILE = os.path.join(FACES_DIR, "ds_model_facenet_detector_opencv_aligned_normalization_base_expand_0.pkl")
+FACE_INDEX_FILE = os.path.join(FACES_DIR, "face_index.f32")
+FACE_NAMES_FILE = os.path.join(FACES_DIR, "face_index_names.json")
+FACE_MODEL = "Facenet"
+FACE_EMBEDDING_DIM = 128
+# Cosine distance at or below which two Facenet embeddings are the same person (DeepFace's default for Facenet)
+FACE_MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", "0.40"))
+# Seconds a successful identification is reused for the same session
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "60"))
 if not os.path.exists(FACES_DIR):
     os.makedirs(FACES_DIR)
     print(f"📁 Created faces directory: {FACES_DIR}")
 
-# --- Helper Functions ---
+# --- Face Index ---
 
-def _find_face_match(image_path: str) -> (str, str):
+class FaceIndex:
     """
-    Uses DeepFace to find a matching face in the database.
-    Returns the name of the match or an error string.
+    On-disk index of known faces: a raw float32 matrix of L2-normalized Facenet
+    embeddings (one row per enrolled image, memory-mapped for reading) plus a
+    JSON name table with one entry per row.
+
+    Enrolling appends a row to the matrix and rewrites the small name table, so
+    the gallery is never re-embedded. Readers in other processes (e.g. the tool
+    process pool) pick up new rows on their next search.
     """
-    try:
-        # First, detect if there's actually a face in the image using a robust detector
-        print(f"[DEBUG] Checking for face detection in {image_path}")
-        try:
-            # Use RetinaFace for more accurate detection (mentioned as overperforming in docs)
-            face_objs = DeepFace.extract_faces(
-                img_path=image_path,
-                enforce_detection=True,  # This will raise an exception if no face detected
-                detector_backend="retinaface",  # More robust than opencv
-                align=True
-            )
-            if not face_objs or len(face_objs) == 0:
-                print("[DEBUG] No faces detected in image")
-                return None, "No face detected in image."
-            print(f"[DEBUG] Found {len(face_objs)} face(s) in image")
-        except Exception as detection_error:
-            print(f"[DEBUG] Face detection failed: {detection_error}")
-            # Fallback to mtcnn if retinaface fails
-            try:
-                print("[DEBUG] Trying fallback detector (mtcnn)...")
-                face_objs = DeepFace.extract_faces(
-                    img_path=image_path,
-                    enforce_detection=True,
-                    detector_backend="mtcnn",
-                    align=True
-                )
-                if not face_objs or len(face_objs) == 0:
-                    print("[DEBUG] No faces detected with fallback detector")
-                    return None, "No face detected in image."
-                print(f"[DEBUG] Fallback detector found {len(face_objs)} face(s)")
-            except Exception as fallback_error:
-                print(f"[DEBUG] Fallback detection also failed: {fallback_error}")
-                return None, "No face detected in image."
-        
-        # If we get here, there's at least one face, so proceed with matching
-        results = DeepFace.find(
-            img_path=image_path,
-            db_path=FACES_DIR,
-            model_name='Facenet',
-            detector_backend="retinaface",  # Use same robust detector for consistency
-            enforce_detection=False,  # We already validated detection above
-            silent=True
+    def __init__(self, index_path: str = FACE_INDEX_FILE, names_path: str = FACE_NAMES_FILE,
+                 dim: int = FACE_EMBEDDING_DIM, threshold: float = FACE_MATCH_THRESHOLD):
+        self.index_path = index_path
+        self.names_path = names_path
+        self.dim = dim
+        self.threshold = threshold
+        self.embeddings = np.empty((0, dim), dtype=np.float32)
+        self.entries: List[Dict[str, str]] = []
+        self._signature = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self.entries)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.names_path)
+
+    def refresh(self):
+        """Re-maps the index files if another process or thread has changed them."""
+        signature = tuple(
+            (os.stat(path).st_mtime_ns, os.stat(path).st_size) if os.path.exists(path) else None
+            for path in (self.index_path, self.names_path)
         )
-        # DeepFace.find returns a list of pandas dataframes.
-        # We add extra checks to ensure the result is a non-empty list of dataframes.
-        if isinstance(results, list) and len(results) > 0 and not results[0].empty:
-            best_match_path = results[0].iloc[0]['identity']
-            name = os.path.splitext(os.path.basename(best_match_path))[0]
-            print(f"[DEBUG] Face matching found: {name}")
-            return name, None
+        if signature == self._signature:
+            return
+        self._signature = signature
+
+        entries = []
+        if os.path.exists(self.names_path):
+            with open(self.names_path, "r") as f:
+                entries = json.load(f)
+        rows = os.path.getsize(self.index_path) // (self.dim * 4) if os.path.exists(self.index_path) else 0
+        count = min(rows, len(entries))  # A row written without its name (or vice versa) is ignored
+        if count:
+            self.embeddings = np.memmap(self.index_path, dtype=np.float32, mode="r", shape=(count, self.dim))
         else:
-            print("[DEBUG] Face detected but no match found in database")
-            return None, "Face detected but no match found."
+            self.embeddings = np.empty((0, self.dim), dtype=np.float32)
+        self.entries = entries[:count]
+
+    def search(self, embedding) -> Tuple[Optional[str], float]:
+        """
+        Returns the name of the closest known face and its cosine distance, or
+        (None, distance) if nothing is within the match threshold.
+        """
+        self.refresh()
+        if not self.entries:
+            return None, 1.0
+        query = self._normalize(embedding)
+        distances = 1.0 - self.embeddings @ query
+        best = int(np.argmin(distances))
+        distance = float(distances[best])
+        if distance > self.threshold:
+            return None, distance
+        return self.entries[best]["name"], distance
+
+    def add(self, name: str, embedding, image: str = ""):
+        """Appends one face to the index without touching existing rows."""
+        row = self._normalize(embedding)
+        with self._lock:
+            self.refresh()
+            count = len(self.entries)
+            self.embeddings, self._signature = np.empty((0, self.dim), dtype=np.float32), None  # Release our map
+            with open(self.index_path, "r+b" if os.path.exists(self.index_path) else "wb") as f:
+                if os.path.getsize(self.index_path) != count * self.dim * 4:
+                    f.truncate(count * self.dim * 4)  # Drop any row left without a name by an interrupted add
+                f.seek(0, os.SEEK_END)
+                f.write(row.tobytes())
+            self._write_entries(self.entries + [{"name": name, "image": image}])
+            self.refresh()
+
+    def rebuild(self, faces: List[Tuple[str, str, Any]]):
+        """Replaces the whole index with (name, image, embedding) triples."""
+        with self._lock:
+            self.embeddings, self._signature = np.empty((0, self.dim), dtype=np.float32), None
+            matrix = np.stack([self._normalize(e) for _, _, e in faces]) if faces else np.empty((0, self.dim), np.float32)
+            matrix.astype(np.float32).tofile(self.index_path)
+            self._write_entries([{"name": name, "image": image} for name, image, _ in faces])
+            self.refresh()
+
+    def _write_entries(self, entries: List[Dict[str, str]]):
+        tmp_path = f"{self.names_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.names_path)
+
+    def _normalize(self, embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+_face_index: Optional[FaceIndex] = None
+
+
+def get_face_index() -> FaceIndex:
+    """Returns this process's face index, building it from the `faces/` images on first use."""
+    global _face_index
+    if _face_index is None:
+        _face_index = FaceIndex()
+        if not _face_index.exists():
+            _build_index_from_gallery(_face_index)
+    return _face_index
+
+
+def _build_index_from_gallery(index: FaceIndex):
+    """One-time migration: embeds every image already in `faces/` into a new index."""
+    images = sorted(f for f in os.listdir(FACES_DIR) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+    faces = []
+    for image in images:
+        face, _ = _embed_face(os.path.join(FACES_DIR, image))
+        if face is not None:
+            faces.append((_name_from_image(image), image, face["embedding"]))
+    index.rebuild(faces)
+    print(f"🗂️ Built face index with {len(faces)} of {len(images)} gallery image(s)")
+
+
+def _name_from_image(image: str) -> str:
+    return os.path.splitext(os.path.basename(image))[0]
+
+
+def _embed_face(image) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Detects, aligns and embeds the most prominent face in an image (a BGR frame
+    or a file path) in a single DeepFace pass. Returns DeepFace's face object
+    (embedding, facial_area, face_confidence) or an error string.
+    """
+    try:
+        face_objs = DeepFace.represent(
+            img_path=image,
+            model_name=FACE_MODEL,
+            detector_backend="retinaface",  # More robust than opencv
+            enforce_detection=True,  # Raises ValueError if no face is detected
+            align=True
+        )
+    except ValueError as e:
+        print(f"[DEBUG] Face detection failed: {e}")
+        return None, "No face detected in image."
     except Exception as e:
-        # This can happen if the db is empty, contains non-image files, etc.
         print(f"DeepFace recognition error: {e}")
         return None, "DeepFace error during recognition."
-    
-    return None, "No match found."
+    if not face_objs:
+        return None, "No face detected in image."
+    face = max(face_objs, key=lambda obj: obj["facial_area"]["w"] * obj["facial_area"]["h"])
+    print(f"[DEBUG] Found {len(face_objs)} face(s), using the largest")
+    return face, None
+
+def _find_face_match(frame) -> Tuple[Optional[str], Optional[List[float]], Optional[str]]:
+    """
+    Embeds the face in an in-memory frame and looks it up in the face index.
+    Returns (name, embedding, error); the embedding is kept so an unknown face
+    can be enrolled without running the models again.
+    """
+    face, error = _embed_face(frame)
+    if face is None:
+        return None, None, error
+    embedding = face["embedding"]
+    name, distance = get_face_index().search(embedding)
+    if name:
+        print(f"[DEBUG] Face matching found: {name} (distance {distance:.3f})")
+        return name, embedding, None
+    print(f"[DEBUG] Face detected but no match found in index (closest distance {distance:.3f})")
+    return None, embedding, "Face detected but no match found."
+
+def _save_pending_face(frame, embedding: Optional[List[float]]) -> str:
+    """
+    Writes an unknown face's frame (and its embedding, if any) to a temp file
+    that `save_new_user_face` later moves into the gallery.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+        face_image_path = tmp.name
+    cv2.imwrite(face_image_path, frame)
+    if embedding is not None:
+        np.save(_pending_embedding_path(face_image_path), np.asarray(embedding, dtype=np.float32))
+    print(f"[DEBUG] Saved unknown face to {face_image_path}")
+    return face_image_path
+
+def _pending_embedding_path(face_image_path: str) -> str:
+    return f"{face_image_path}.npy"
+
+def _enroll_image(name: str, image_path: str) -> bool:
+    """Embeds a gallery image and adds it to the index. Returns False if no face was found."""
+    face, _ = _embed_face(image_path)
+    if face is None:
+        return False
+    get_face_index().add(name, face["embedding"], os.path.basename(image_path))
+    return True
+
+# --- Model Residency ---
 
-def get_face_encoding(image_path):
-    """Gets the face encoding for a single image."""
+_models_ready = False
+
+def warm_up():
+    """
+    Loads the face detector, the embedding model and the face index into this
+    process. Used as the vision worker pool's initializer so no identification
+    pays for a cold model load.
+    """
+    global _models_ready
+    started = time.perf_counter()
     try:
-        # The `enforce_detection=False` is important for single images
-        embedding_objs = DeepFace.represent(
-            img_path=image_path,
-            model_name="Facenet",
-            enforce_detection=False,
-            detector_backend="opencv"
+        DeepFace.represent(
+            img_path=np.zeros((160, 160, 3), dtype=np.uint8),
+            model_name=FACE_MODEL,
+            detector_backend="retinaface",
+            enforce_detection=False
         )
-        if embedding_objs and 'embedding' in embedding_objs[0]:
-            return embedding_objs[0]['embedding']
+        get_face_index()
+        _models_ready = True
+        print(f"🔥 Vision worker {os.getpid()} warmed up in {time.perf_counter() - started:.1f}s")
     except Exception as e:
-        print(f"Error getting face encoding: {e}")
-    return None
+        print(f"⚠️ Vision worker {os.getpid()} failed to warm up: {e}")
 
-def save_known_faces(known_faces):
-    """Saves the known faces dictionary to a pickle file."""
-    with open(KNOWN_FACES_FILE, "wb") as f:
-        pickle.dump(known_faces, f)
-
-def load_known_faces():
-    """Loads known faces from the pickle file."""
-    if os.path.exists(KNOWN_FACES_FILE):
-        with open(KNOWN_FACES_FILE, "rb") as f:
-            return pickle.load(f)
-    return {}
+def worker_status() -> Dict[str, Any]:
+    """Reports whether this process has its models loaded."""
+    return {
+        "pid": os.getpid(),
+        "models_loaded": _models_ready,
+        "known_faces": len(get_face_index()) if _models_ready else None,
+    }
 
 # --- Main Tool Functions ---
 
-def identify_user() -> Dict[str, Any]:
+def identify_user(frame=None) -> Dict[str, Any]:
     """
     Captures and identifies a user via webcam. This is a BLOCKING, CPU-BOUND function.
+    `frame` is the camera frame provided by the registry; without it one is captured here.
     """
-    print("[DEBUG] identify_user function called - capturing webcam image...")
-    frame, error = capture_image()
-    if error:
-        print(f"[DEBUG] Camera error: {error}")
-        return {"response": error}
-
-    # A temporary file is needed for DeepFace to analyze
-    tmp_file = None
+    print("[DEBUG] identify_user function called")
+    if frame is None:
+        frame, error = capture_image(best=True, require_face=True)
+        if error:
+            print(f"[DEBUG] Camera error: {error}")
+            return {"response": error}
+
     try:
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
-            tmp_file = tmp.name
-        cv2.imwrite(tmp_file, frame)
-        print(f"[DEBUG] Saved webcam capture to {tmp_file}")
-
-        # Only search for a match if there are known faces
-        if not any(f.lower().endswith(('.jpg', '.jpeg', '.png')) for f in os.listdir(FACES_DIR)):
-            print("[DEBUG] No known faces in database")
-            return {
-                "response": "I don't recognize you. I'll go ahead and remember you. What's your name?",
-                "needs_name": True,
-                "face_image_path": tmp_file
-            }
+        started = time.perf_counter()
+        name, embedding, error_msg = _find_face_match(frame)
+        print(f"[DEBUG] Recognition took {(time.perf_counter() - started) * 1000:.0f}ms")
 
-        print("[DEBUG] Searching for face match...")
-        name, error_msg = _find_face_match(tmp_file)
-        
         if error_msg and "No face detected" in error_msg:
             print("[DEBUG] No face detected in camera view")
             return {"response": "I don't see anyone in the camera view right now."}
         elif name:
             print(f"[DEBUG] Found match: {name}")
-            return {"response": f"You're {name}! I remember you."}
+            return {"response": f"You're {name}! I remember you.", "name": name}
+
+        # Face detected but no match found, ask for name
+        if len(get_face_index()) == 0:
+            response = "I don't recognize you. I'll go ahead and remember you. What's your name?"
         else:
-            # Face detected but no match found, ask for name
-            print("[DEBUG] Face detected but no match found")
-            return {
-                "response": "I can see someone, but I don't recognize you. I'll go ahead and remember you. What's your name?",
-                "needs_name": True,
-                "face_image_path": tmp_file
-            }
+            response = "I can see someone, but I don't recognize you. I'll go ahead and remember you. What's your name?"
+        return {
+            "response": response,
+            "needs_name": True,
+            "face_image_path": _save_pending_face(frame, embedding)
+        }
     except Exception as e:
         print(f"Error in identify_user: {e}")
         return {"response": f"Sorry, I encountered a recognition error: {str(e)}"}
-    finally:
-        # Clean up the temp image if a name was found (and the temp file path exists)
-        if 'name' in locals() and name and tmp_file and os.path.exists(tmp_file):
-             os.remove(tmp_file)
 
 
 def save_new_user_face(name: str, face_image_path: str) -> Dict[str, Any]:
@@ -178,6 +313,8 @@ def save_new_user_face(name: str, face_image_path: str) -> Dict[str, Any]:
     if not name or not name.strip() or not face_image_path or not os.path.exists(face_image_path):
         if face_image_path and os.path.exists(face_image_path):
              os.remove(face_image_path) # Clean up orphaned image
+        if face_image_path and os.path.exists(_pending_embedding_path(face_image_path)):
+             os.remove(_pending_embedding_path(face_image_path))
         return {"response": "Sorry, something went wrong. I couldn't save the face because the name or image was missing."}
         
     try:
@@ -199,12 +336,18 @@ def save_new_user_face(name: str, face_image_path: str) -> Dict[str, Any]:
         shutil.move(face_image_path, destination_path)
         print(f"[DEBUG] Moved face image to {destination_path}")
         
-        # When a new face is added, DeepFace's cached representations become stale.
-        # Removing this file forces DeepFace to rebuild it on the next `find` call.
-        pickle_file = os.path.join(FACES_DIR, "representations_facenet.pkl")
-        if os.path.exists(pickle_file):
-            os.remove(pickle_file)
-            print(f"🗑️ Removed stale embeddings file: {pickle_file}")
+        # Add just this face to the index; existing embeddings are left untouched.
+        # identify_user already embedded it, so the models only run again (in a
+        # vision worker) if that was lost.
+        embedding_path = _pending_embedding_path(face_image_path)
+        if os.path.exists(embedding_path):
+            get_face_index().add(clean_name, np.load(embedding_path), os.path.basename(destination_path))
+        else:
+            from .registry import tools_registry
+            if not tools_registry.run_in_lane("vision", "save_new_user_face",
+                                              partial(_enroll_image, clean_name, destination_path)):
+                os.remove(destination_path)
+                return {"response": "Sorry, I couldn't make out a face clearly enough to remember it. Could we try again?"}
 
         print(f"✅ Saved new face: {destination_path}")
         return {"response": f"Got it, {clean_name}! I've saved your face for next time."}
@@ -214,10 +357,12 @@ def save_new_user_face(name: str, face_image_path: str) -> Dict[str, Any]:
         print(f"Error in save_new_user_face: {e}")
         return {"response": f"Sorry, I couldn't save your face due to an error: {str(e)}"}
     finally:
-        # Ensure the temp file is gone even if saving fails
+        # Ensure the temp files are gone even if saving fails
         if face_image_path and os.path.exists(face_image_path):
             os.remove(face_image_path)
             print(f"[DEBUG] Cleaned up temp image {face_image_path}")
+        if face_image_path and os.path.exists(_pending_embedding_path(face_image_path)):
+            os.remove(_pending_embedding_path(face_image_path))
 
 # --- OpenAI Schemas and Registration ---
 
@@ -260,13 +405,21 @@ def register_facial_recognition_tools():
         "identify_user", 
         identify_user, 
         IDENTIFY_USER_SCHEMA,
-        flags={"cpu_bound": True}  # This is CPU-intensive
+        flags={
+            "cpu_bound": True, "vision": True, "camera": "face",  # CPU-intensive; runs in the warm vision pool
+            # Asking again within a minute reuses the match; misses and "no face" are retried
+            "cache": {"ttl": IDENTITY_CACHE_TTL, "tags": ("identity",), "only_if": lambda result: bool(result.get("name"))},
+        }
     )
     tools_registry.register_tool(
         "save_new_user_face", 
         save_new_user_face, 
-        SAVE_USER_FACE_SCHEMA
-        # No flag needed, will default to a thread for I/O
+        SAVE_USER_FACE_SCHEMA,
+        flags={
+            # File I/O in the default lane; needs the face identify_user saved; one index write at a time
+            "max_concurrency": 1, "serial": True,
+            "invalidates": ("identity",),
+        }
     )
     
     print("📸 Facial recognition tools registered successfully") 
\ No newline at end of file
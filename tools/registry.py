@@ -3,20 +3,29 @@ Tools Registry for Ambit AI Function Calling
 Manages all available tools and their metadata for OpenAI function calling.
 """
 
-import json
+import os
 from typing import Dict, List, Callable, Any, Optional
 from concurrent.futures import Executor
 import asyncio
-import inspect
-import functools
 import warnings
 from functools import partial
 
+from ambit_shared_memory import call_with_shared_arrays, shared_arguments
+from .executor_lanes import ExecutorLane, ToolTimeoutError
+from .result_cache import _MISSING, ToolResultCache, make_cache_key
+
+# Tools without any other lane flag run in this lane when it exists
+DEFAULT_LANE = "io"
+
 class ToolsRegistry:
     def __init__(self):
         self.tools: Dict[str, Callable] = {}
         self.tool_schemas: List[Dict] = []
         self.tool_flags: Dict[str, Dict] = {}
+        self.lanes: Dict[str, ExecutorLane] = {}  # Flag -> lane for tools with that flag, in routing order
+        self.frame_provider: Optional[Callable[[], Any]] = None
+        self.result_cache = ToolResultCache(int(os.getenv("TOOL_CACHE_SIZE", "256")))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None  # The loop lanes are driven from
     
     def register_tool(self, name: str, function: Callable, schema: Dict, flags: Optional[Dict] = None):
         """Register a new tool with its function, schema, and flags"""
@@ -25,6 +34,54 @@ class ToolsRegistry:
         self.tool_flags[name] = flags or {}
         print(f"Registered tool: {name}")
     
+    def set_executor(self, flag: str, executor: Executor, max_concurrency: int = 1,
+                     timeout: Optional[float] = None, per_tool: Optional[int] = None):
+        """
+        Routes sync tools registered with `flag` to a lane running on `executor`.
+        Lanes are checked in the order they were added, so a tool flagged both
+        `vision` and `cpu_bound` goes to whichever lane was added first. Tools can
+        override the lane's limits with `max_concurrency` and `timeout` flags.
+        """
+        self.lanes[flag] = ExecutorLane(flag, executor, max_concurrency, timeout, per_tool)
+
+    def set_frame_provider(self, provider: Callable[[bool], Any]):
+        """
+        Sets the function (taking `require_face`, returning a frame and an error) used
+        to hand tools flagged `camera` a camera frame, so they don't open the device
+        themselves. A `camera` flag of "face" asks for a frame with a face in it.
+        """
+        self.frame_provider = provider
+
+    def get_lane(self, name: str) -> Optional[ExecutorLane]:
+        """Returns the lane for a tool's flags, the default lane, or None."""
+        flags = self.tool_flags.get(name, {})
+        for flag, lane in self.lanes.items():
+            if flags.get(flag):
+                return lane
+        return self.lanes.get(DEFAULT_LANE)
+
+    def run_in_lane(self, flag: str, tool_name: str, func: Callable[[], Any]) -> Any:
+        """
+        Runs `func` in another lane from a sync tool's worker thread and waits for
+        its result, e.g. to hand one expensive step to the vision workers. Without
+        that lane (or a loop to schedule it on) `func` runs in the calling thread.
+        """
+        lane = self.lanes.get(flag)
+        if lane is None or self.loop is None:
+            return func()
+        return asyncio.run_coroutine_threadsafe(lane.run(tool_name, func), self.loop).result()
+
+    def get_lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, throughput and timeout counters per lane."""
+        return {flag: lane.get_stats() for flag, lane in self.lanes.items()}
+
+    def invalidate(self, tag: Optional[str] = None, tool_name: Optional[str] = None) -> int:
+        """Drops cached results carrying `tag` and/or produced by `tool_name`. Returns how many were dropped."""
+        return self.result_cache.invalidate(tag, tool_name)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.result_cache.get_stats()
+
     def get_tool(self, name: str) -> Callable:
         """Get a tool function by name"""
         return self.tools.get(name)
@@ -41,19 +98,71 @@ class ToolsRegistry:
         tool_function = self.tools[name]
         return tool_function(**arguments)
 
-    async def acall_tool(self, tool_name: str, tool_args: dict, executor: Optional[Executor] = None) -> Any:
-        """Asynchronously calls a tool, running sync tools in an executor."""
+    async def acall_tool(self, tool_name: str, tool_args: dict, executor: Optional[Executor] = None,
+                         session_id: Optional[str] = None) -> Any:
+        """
+        Asynchronously calls a tool, running sync tools in an executor.
+
+        Tools flagged `cache` (a dict: `ttl` seconds, optional `tags`, `scope` of
+        "session" or "global", and an `only_if` predicate on the result) have their
+        results memoized per tool, arguments and, for session scope, `session_id`.
+        Tools flagged `invalidates` (a list of tags) drop those entries once they run.
+        """
         if tool_name not in self.tools:
             return f"Error: Tool '{tool_name}' not found."
+        self.loop = asyncio.get_running_loop()
+
+        flags = self.tool_flags[tool_name]
+        cache = flags.get("cache")
+        if cache:
+            key = make_cache_key(tool_name, tool_args, session_id if cache.get("scope", "session") == "session" else None)
+            result = self.result_cache.get(key)
+            if result is not _MISSING:
+                print(f"♻️ Cached result for {tool_name}")
+                return result
 
+        result = await self._call_tool(tool_name, tool_args, executor)
+
+        for tag in flags.get("invalidates", ()):
+            dropped = self.invalidate(tag)
+            if dropped:
+                print(f"♻️ {tool_name} invalidated {dropped} cached '{tag}' result(s)")
+        failed = isinstance(result, str) and result.startswith("Error:")  # Timeouts and the like
+        if cache and not failed and cache.get("only_if", lambda _: True)(result):
+            self.result_cache.put(key, result, cache["ttl"], cache.get("tags", ()))
+        return result
+
+    async def _call_tool(self, tool_name: str, tool_args: dict, executor: Optional[Executor] = None) -> Any:
         func = self.tools[tool_name]
         
         # For async tools, we can just await them directly.
         if asyncio.iscoroutinefunction(func):
             return await func(**tool_args)
         
-        # For sync tools, run them in the provided executor to avoid blocking.
-        if executor:
+        # Camera tools get a frame from this process's capture service
+        camera = self.tool_flags[tool_name].get("camera")
+        if camera and self.frame_provider and "frame" not in tool_args:
+            frame, error = await asyncio.to_thread(self.frame_provider, camera == "face")
+            if error:
+                return {"response": error}
+            tool_args = dict(tool_args, frame=frame)
+
+        # For sync tools, run them in their flag's lane (or the provided executor) to avoid blocking.
+        lane = self.get_lane(tool_name)
+        if lane:
+            flags = self.tool_flags[tool_name]
+            try:
+                if lane.out_of_process:
+                    # Frames and other large arrays travel through shared memory, not pickle
+                    with shared_arguments(tool_args) as shared_args:
+                        return await lane.run(tool_name, partial(call_with_shared_arrays, func, **shared_args),
+                                              cap=flags.get("max_concurrency"), timeout=flags.get("timeout"))
+                return await lane.run(tool_name, partial(func, **tool_args),
+                                      cap=flags.get("max_concurrency"), timeout=flags.get("timeout"))
+            except ToolTimeoutError as e:
+                print(f"⏱️ Tool {e}")
+                return f"Error: Tool '{tool_name}' took too long to respond."
+        elif executor:
             loop = asyncio.get_running_loop()
             # Use a partial to pass arguments to the function in the executor
             p_func = partial(func, **tool_args)
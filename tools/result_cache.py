@@ -0,0 +1,71 @@
+"""
+Tool Result Cache for Ambit AI
+Memoizes results of tools that opt in with a `cache` flag.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+_MISSING = object()
+
+
+def make_cache_key(tool_name: str, tool_args: Dict[str, Any], session_id: Optional[str] = None) -> Tuple:
+    """Builds a key from the tool name, its JSON arguments and (for session-scoped entries) the session."""
+    return tool_name, json.dumps(tool_args, sort_keys=True, default=str), session_id
+
+
+class ToolResultCache:
+    """
+    A TTL + LRU cache of tool results. Each entry carries tags (e.g. "identity")
+    so tools that change the underlying state can invalidate every result that
+    depended on it.
+    """
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, Tuple[float, frozenset, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value, or `_MISSING` if there is none or it has expired."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return _MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: Hashable, value: Any, ttl: float, tags: Iterable[str] = ()):
+        self.entries[key] = (time.monotonic() + ttl, frozenset(tags), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tag: Optional[str] = None, tool_name: Optional[str] = None) -> int:
+        """Drops entries carrying `tag` and/or belonging to `tool_name` (everything if neither is given)."""
+        stale = [key for key, (_, tags, _) in self.entries.items()
+                 if (tag is None or tag in tags) and (tool_name is None or key[0] == tool_name)]
+        for key in stale:
+            del self.entries[key]
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
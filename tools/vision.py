@@ -3,46 +3,53 @@ Vision Tool for Ambit AI
 Provides the ability to see and understand images.
 """
 
-import os
 import cv2
 import base64
-import tempfile
-import openai
 from typing import Dict, Any
 
 from .camera_utils import capture_image
+from ambit_clients import get_openai_client
 from ambit_instructions import get_system_prompt
 
+# `detail: low` images are processed at 512x512, so larger uploads only cost bandwidth
+LOW_DETAIL_SIZE = 512
+JPEG_QUALITY = 85
+
+# --- Helper Functions ---
+
+def encode_image_for_upload(frame, max_size: int = LOW_DETAIL_SIZE) -> str:
+    """Downscales a frame to fit `max_size` and JPEG-encodes it in memory as a data URL."""
+    height, width = frame.shape[:2]
+    scale = max_size / max(height, width)
+    if scale < 1:
+        frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise ValueError("Could not encode the camera frame as JPEG")
+    return f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('ascii')}"
+
 # --- Main Tool Function ---
 
-def analyze_image_from_webcam(user_prompt: str) -> Dict[str, Any]:
+def analyze_image_from_webcam(user_prompt: str, frame=None) -> Dict[str, Any]:
     """
     Captures an image from the webcam, sends it to a vision-capable model
     for analysis, and returns a descriptive response. This is a BLOCKING,
-    I/O-bound, and potentially long-running function.
+    I/O-bound, and potentially long-running function. `frame` is the camera
+    frame provided by the registry; without it one is captured here.
     """
     print("[DEBUG] analyze_image_from_webcam function called...")
     
     # 1. Capture the image
-    frame, error = capture_image()
-    if error:
-        print(f"[DEBUG] Camera error: {error}")
-        return {"response": error}
+    if frame is None:
+        frame, error = capture_image(best=True)
+        if error:
+            print(f"[DEBUG] Camera error: {error}")
+            return {"response": error}
 
     # 2. Encode the image for API transmission
-    tmp_file = None
     try:
-        # Save to a temporary file to encode it
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
-            tmp_file = tmp.name
-        cv2.imwrite(tmp_file, frame)
-        print(f"[DEBUG] Saved webcam capture to {tmp_file}")
-
-        # Read the file and encode it in base64
-        with open(tmp_file, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-        
-        image_url = f"data:image/jpeg;base64,{base64_image}"
+        image_url = encode_image_for_upload(frame)
+        print(f"[DEBUG] Encoded webcam capture ({len(image_url) // 1024} KB)")
 
         # 3. Get the prompts
         system_prompt = get_system_prompt()
@@ -50,9 +57,7 @@ def analyze_image_from_webcam(user_prompt: str) -> Dict[str, Any]:
 
         # 4. Call OpenAI Vision API
         print("[DEBUG] Sending image to OpenAI for analysis...")
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o",
             messages=[
                 {
@@ -80,11 +85,6 @@ def analyze_image_from_webcam(user_prompt: str) -> Dict[str, Any]:
     except Exception as e:
         print(f"Error in analyze_image_from_webcam: {e}")
         return {"response": f"Sorry, I encountered an error analyzing the image: {str(e)}"}
-    finally:
-        # Clean up the temporary image file
-        if tmp_file and os.path.exists(tmp_file):
-            os.remove(tmp_file)
-            print(f"[DEBUG] Cleaned up temp image {tmp_file}")
 
 
 # --- OpenAI Schema and Registration ---
@@ -113,7 +113,7 @@ def register_vision_tools():
         "analyze_image_from_webcam", 
         analyze_image_from_webcam, 
         ANALYZE_IMAGE_SCHEMA,
-        flags={"long_running": True}
+        flags={"long_running": True, "camera": True}
     )
     
     print("👁️ Vision tools registered successfully") 
\ No newline at end of file
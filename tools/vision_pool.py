@@ -0,0 +1,58 @@
+"""
+Vision Worker Pool for Ambit AI
+A dedicated process pool whose workers keep the face models loaded.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from .facial_recognition import warm_up, worker_status
+
+
+class VisionWorkerPool:
+    """
+    Long-lived worker processes for tools flagged `vision`. Each worker runs
+    `warm_up` when it starts, so the detector, Facenet and the face index are
+    resident before the first identification. Workers are never recycled, so
+    they stay warm for the life of the server.
+    """
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max_workers
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=warm_up)
+        self.workers: Dict[int, Dict[str, Any]] = {}
+        self.warmup_seconds: Optional[float] = None
+
+    async def warm(self):
+        """Starts every worker and records its status. Run as a background task at startup."""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        statuses = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, worker_status) for _ in range(self.max_workers)),
+            return_exceptions=True
+        )
+        for status in statuses:
+            if isinstance(status, dict):
+                self.workers[status["pid"]] = status
+            else:
+                print(f"⚠️ Vision worker failed to start: {status}")
+        self.warmup_seconds = time.perf_counter() - started
+        state = "ready" if self.ready else "not ready"
+        print(f"👁️ Vision pool {state}: {len(self.workers)} worker(s) in {self.warmup_seconds:.1f}s")
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.workers) and all(status["models_loaded"] for status in self.workers.values())
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "workers": len(self.workers),
+            "max_workers": self.max_workers,
+            "models_loaded": [status["models_loaded"] for status in self.workers.values()],
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)